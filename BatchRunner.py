@@ -0,0 +1,223 @@
+import argparse
+import multiprocessing
+import sys
+import time
+from collections import namedtuple
+from itertools import product
+
+from bots.AlphaBetaPolicy import AlphaBetaPolicy
+from bots.MixedPolicy import MixedPolicy
+from bots.GreedyPolicy import GreedyPolicy
+from bots.MCTSPolicy import MCTSPolicy
+from bots.fCompetitor import fCompetitor
+from bots.Seeding import battle_seed, seed_battle, seed_global
+from bots.Thunder_BattlePolicies import ThunderPlayer
+from bots.hayo5 import hayo5_BattlePolicy
+
+from vgc.behaviour import BattlePolicy
+from vgc.behaviour.BattlePolicies import Minimax, PrunedBFS
+from vgc.competition.BattleMatch import BattleMatch
+from vgc.competition.Competitor import CompetitorManager
+from vgc.datatypes.Objects import GameState
+from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
+from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
+
+from ResultsStore import ResultsStore
+
+# Esecuzione senza interfaccia di molte competizioni, al posto dei cicli tqdm di BattleTester:
+# la matrice (policy, profondità) x avversario x seed viene divisa in job, uno per competizione
+# (stesse regole di BattleTester: un roster e due team dal seed, 5 battaglie per lato con lo
+# scambio dei team), giocati da un pool di processi. Quando tutti i seed di una cella sono
+# finiti la cella viene scritta in ResultsStore con le vittorie e il throughput (battaglie e
+# turni al secondo di calcolo dei worker); se l'esecuzione si interrompe, le celle a metà
+# vengono scritte comunque, marcate come parziali. L'avanzamento è una riga ogni
+# progress_every secondi. Anche gli avversari con una ricerca vogliono la profondità.
+#
+#   python BatchRunner.py --policies AlphaBeta:2,4 Mixed:4 --opponents Greedy AlphaBeta:2 --seeds 0-99
+
+N_BATTLES_PER_SIDE = 5
+
+# costruttori delle policy per nome; la profondità viene ignorata da quelle che non ne hanno
+POLICIES = {
+  'Greedy': lambda depth: GreedyPolicy(),
+  'AlphaBeta': lambda depth: AlphaBetaPolicy(depth),
+  'Mixed': lambda depth: MixedPolicy(depth),
+  'MCTS': lambda depth: MCTSPolicy(max_tree_depth=depth),
+  'MiniMax': lambda depth: Minimax(),
+  'PrunedBFS': lambda depth: PrunedBFS(),
+  'Thunder': lambda depth: ThunderPlayer(),
+  'Hayo5': lambda depth: hayo5_BattlePolicy(),
+}
+# policy che senza profondità farebbero una ricerca a profondità 0
+DEPTH_POLICIES = ('AlphaBeta', 'Mixed', 'MCTS')
+
+# una competizione: la nostra policy e l'avversario con le loro profondità, e il seed
+Job = namedtuple('Job', ['policy', 'depth', 'opponent', 'opponent_depth', 'seed'])
+
+class TurnCounter(BattlePolicy):
+  # conta le get_action della nostra policy, una per turno
+
+  def __init__(self, policy: BattlePolicy):
+    self.policy = policy
+    self.turns = 0
+
+  def get_action(self, g: GameState) -> int:
+    self.turns += 1
+    return self.policy.get_action(g)
+
+  def close(self):
+    self.policy.close()
+
+# policy già costruite nel worker, riusate dai job successivi con lo stesso lato, nome e profondità
+_policies = {}
+
+def worker_policy(side: int, name: str, depth: int) -> BattlePolicy:
+  # una per lato, così una policy contro sé stessa non condivide TT e generatore
+  key = (side, name, depth)
+  if key not in _policies:
+    _policies[key] = POLICIES[name](depth)
+  return _policies[key]
+
+def play_competition(job: Job) -> tuple:
+  start = time.perf_counter()
+  seed_global(job.seed)
+  roster = RandomPkmRosterGenerator().gen_roster()
+  tg = RandomTeamFromRoster(roster)
+  policies = [worker_policy(0, job.policy, job.depth), worker_policy(1, job.opponent, job.opponent_depth)]
+  counter = TurnCounter(policies[0])
+  c0 = fCompetitor('Player1')
+  c1 = fCompetitor('Player2')
+  c0._battle_policy = counter
+  c1._battle_policy = policies[1]
+  cm0 = CompetitorManager(c0)
+  cm1 = CompetitorManager(c1)
+  cm0.team = tg.get_team()
+  cm1.team = tg.get_team()
+  wins = 0
+  index = 0
+  for _ in range(2):
+    for _ in range(N_BATTLES_PER_SIDE):
+      seed_battle(battle_seed(job.seed, index), policies)
+      index += 1
+      match = BattleMatch(cm0, cm1, debug=False)
+      match.run()
+      wins += match.winner() == 0
+    cm0.team, cm1.team = cm1.team, cm0.team
+  return job, wins, index, counter.turns, time.perf_counter() - start
+
+def parse_policies(specs: list) -> list:
+  # 'AlphaBeta:2,4' -> [('AlphaBeta', 2), ('AlphaBeta', 4)]; 'Greedy' -> [('Greedy', 0)]
+  policies = []
+  for spec in specs:
+    name, _, depths = spec.partition(':')
+    if name not in POLICIES:
+      raise ValueError(f'unknown policy {name}, choose from {", ".join(POLICIES)}')
+    if name in DEPTH_POLICIES and not depths:
+      raise ValueError(f'{name} needs a depth, e.g. {name}:4')
+    policies += [(name, int(depth)) for depth in depths.split(',')] if depths else [(name, 0)]
+  return policies
+
+def parse_seeds(spec: str) -> list:
+  # '0-99' oppure '1,5,7'
+  if '-' in spec:
+    first, last = spec.split('-')
+    return list(range(int(first), int(last) + 1))
+  return [int(seed) for seed in spec.split(',')]
+
+class Cell():
+  # risultati di una cella della matrice, accumulati competizione per competizione
+
+  def __init__(self):
+    self.competitions = 0
+    self.wins = 0
+    self.competition_wins = 0
+    self.battles = 0
+    self.turns = 0
+    self.elapsed = 0.
+
+  def add(self, wins: int, battles: int, turns: int, elapsed: float) -> None:
+    self.competitions += 1
+    self.wins += wins
+    self.competition_wins += wins > battles // 2
+    self.battles += battles
+    self.turns += turns
+    self.elapsed += elapsed
+
+def opponent_label(name: str, depth: int) -> str:
+  # nome dell'avversario in ResultsStore, con la profondità come nei nomi del torneo (es. AlphaBeta4)
+  return f'{name}{depth}' if depth > 0 else name
+
+def store_cell(store: ResultsStore, key: tuple, cell: Cell, **extra) -> None:
+  # stessa riga di BattleTester, più il throughput della cella
+  name, depth, opponent, opponent_depth = key
+  store.append(name, opponent_label(opponent, opponent_depth), depth, round(cell.wins * 10 / cell.competitions, 3),
+               cell.competition_wins, battles=cell.battles, turns=cell.turns,
+               battles_per_sec=cell.battles / cell.elapsed, turns_per_sec=cell.turns / cell.elapsed, **extra)
+
+def run(policies: list, opponents: list, seeds: list, processes: int = None, progress_every: float = 10.,
+    store: ResultsStore = None) -> dict:
+  jobs = [Job(name, depth, opponent, opponent_depth, seed)
+          for (name, depth), (opponent, opponent_depth), seed in product(policies, opponents, seeds)]
+  cells = {}
+  written = set()
+  store = store if store is not None else ResultsStore()
+  start = time.perf_counter()
+  last_report = start
+  battles = 0
+  turns = 0
+  try:
+    with multiprocessing.Pool(processes) as pool:
+      for done, (job, wins, n_battles, n_turns, elapsed) in enumerate(pool.imap_unordered(play_competition, jobs), 1):
+        key = (job.policy, job.depth, job.opponent, job.opponent_depth)
+        cell = cells.setdefault(key, Cell())
+        cell.add(wins, n_battles, n_turns, elapsed)
+        battles += n_battles
+        turns += n_turns
+        if cell.competitions == len(seeds):
+          store_cell(store, key, cell)
+          written.add(key)
+        now = time.perf_counter()
+        if now - last_report >= progress_every or done == len(jobs):
+          wall = now - start
+          eta = wall / done * (len(jobs) - done)
+          print(f'{done}/{len(jobs)} competitions, {battles / wall:.2f} battles/s, {turns / wall:.1f} turns/s, '
+                f'eta {eta / 60:.1f} min', flush=True)
+          last_report = now
+  finally:
+    # interruzione (Ctrl-C, errore di un worker): le celle a metà non vanno perse
+    for key, cell in cells.items():
+      if key not in written:
+        store_cell(store, key, cell, partial=True, competitions=cell.competitions)
+        print(f'partial cell {key}: {cell.competitions}/{len(seeds)} competitions written', flush=True)
+  return cells
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Headless batch of competitions on a process pool')
+  parser.add_argument('--policies', nargs='+', default=['AlphaBeta:2,4', 'Mixed:4'],
+                      help='our policies as Name or Name:depth,depth (' + ', '.join(POLICIES) + ')')
+  parser.add_argument('--opponents', nargs='+', default=['Greedy'],
+                      help='opponents as Name or Name:depth,depth, like --policies')
+  parser.add_argument('--seeds', default='0-9', help='one competition per seed: 0-99 or 1,5,7')
+  parser.add_argument('--processes', type=int, default=None, help='worker processes (default: all cores)')
+  parser.add_argument('--progress-every', type=float, default=10., help='seconds between progress lines')
+  args = parser.parse_args(argv)
+
+  try:
+    policies = parse_policies(args.policies)
+    opponents = parse_policies(args.opponents)
+  except ValueError as e:
+    parser.error(str(e))
+  seeds = parse_seeds(args.seeds)
+  start = time.perf_counter()
+  cells = run(policies, opponents, seeds, args.processes, args.progress_every)
+  wall = time.perf_counter() - start
+  for (name, depth, opponent, opponent_depth), cell in sorted(cells.items()):
+    print(f'{name}({depth}) vs {opponent_label(opponent, opponent_depth)}: {cell.wins}/{cell.battles} battles, '
+          f'{cell.competition_wins}/{cell.competitions} competitions, '
+          f'{cell.battles / cell.elapsed:.2f} battles/s, {cell.turns / cell.elapsed:.1f} turns/s per worker')
+  battles = sum(cell.battles for cell in cells.values())
+  print(f'{battles} battles in {wall:.1f}s ({battles / wall:.2f} battles/s)')
+  print(ResultsStore().aggregates())
+
+if __name__=='__main__':
+  main(sys.argv[1:])
@@ -4,6 +4,8 @@ from bots.AlphaBetaPolicy import AlphaBetaPolicy
 from bots.MixedPolicy import MixedPolicy
 from bots.GreedyPolicy import GreedyPolicy
 from bots.fCompetitor import fCompetitor
+from bots.Profiling import Profiler
+from bots.Seeding import battle_seed, seed_battle, seed_global
 from bots.Thunder_BattlePolicies import ThunderPlayer
 from bots.hayo5 import hayo5_BattlePolicy
 
@@ -16,9 +18,19 @@ from vgc.behaviour.BattlePolicies import TerminalPlayer, Minimax, PrunedBFS
 import pandas as pd
 import numpy as np
 
+from ResultsStore import ResultsStore
+from TrajectoryRecorder import TrajectoryRecorder
+
+# per molte competizioni senza barre di avanzamento, su tutti i core, vedi BatchRunner.py
 def main():
   n_matches: int = 5
   debug: bool = False
+  # ogni battaglia usa battle_seed(seed, indice), quindi si può rigiocare da sola
+  seed: int = 0
+  # cartella per le traiettorie delle battaglie (None per non registrarle)
+  record = None
+  # misura durata e lavoro di ogni get_action (spento: nessun costo)
+  profile: bool = False
   c0 = fCompetitor('Player1')
   c1 = fCompetitor('Player2')
 
@@ -31,9 +43,21 @@ def main():
   c0._battle_policy = GreedyPolicy()
   c1._battle_policy = Minimax()
 
+  policies = [c0._battle_policy, c1._battle_policy]
+  profiler = Profiler() if profile else None
+  if profiler is not None:
+    c0._battle_policy = profiler.wrap(c0._battle_policy, our_policy)
+    c1._battle_policy = profiler.wrap(c1._battle_policy, opp_policy)
+  recorder = TrajectoryRecorder(record) if record is not None else None
+  if recorder is not None:
+    c0._battle_policy = recorder.wrap(c0._battle_policy, 0)
+    c1._battle_policy = recorder.wrap(c1._battle_policy, 1)
+
   cm0 = CompetitorManager(c0)
   cm1 = CompetitorManager(c1)
+  seed_global(seed)
   roster = RandomPkmRosterGenerator().gen_roster()
+  battle_index = 0
   
   total_wins = 0
   tot_wins: int = 0
@@ -47,8 +71,14 @@ def main():
     for _ in range(2):
       for _ in tqdm(range(5), leave=False):
         j+=1
+        seed_battle(battle_seed(seed, battle_index), policies)
+        if recorder is not None:
+          recorder.begin_battle(battle_index, battle_seed(seed, battle_index))
+        battle_index += 1
         match = BattleMatch(cm0, cm1, debug=debug)
         match.run()
+        if recorder is not None:
+          recorder.end_battle(match.winner())
         wins0 += match.winner() == 0
         total_wins += match.winner() == 0
         pbar.set_description(f'Matches won: {wins0}/{j}, Competitions won: {tot_wins}/{i}')
@@ -62,29 +92,19 @@ def main():
 
   write_results(our_policy, opp_policy, round(max_depth,0), round((total_wins*10)/n_matches, 3), tot_wins)
 
+  if profiler is not None:
+    print(profiler.report().to_string(index=False))
+    print(f'Search time saved by the fast tiers: {profiler.saved_time():.1f}s')
   print(f'{c0.name} won {tot_wins}/{n_matches}, tied {tot_ties}/{n_matches} and lost {n_matches-tot_ties-tot_wins}/{n_matches} competitions. \nTotal battle wins: {total_wins}')
 
 
 def write_results(our_policy, opp_policy, max_depth, tot_wins, total_wins):
-  res = pd.read_csv('results.csv')
-  res.loc[len(res)] = [our_policy, opp_policy, max_depth, tot_wins, total_wins]
-  sorted_res = res.sort_values(by=["our_policy", "max_depth", "opp_policy"])
-  sorted_res.to_csv("results.csv", index=False)
+  # aggiunta in coda allo store, le medie vengono aggiornate insieme alla riga
+  ResultsStore().append(our_policy, opp_policy, max_depth, tot_wins, total_wins)
 
 if __name__=='__main__':
   for i in range(1):
     main()
-  # Raggruppa per ogni accoppiamento e calcola la media e il conteggio
-  res = pd.read_csv('results.csv')
-  means = (
-    res.groupby(["opp_policy", "our_policy", "max_depth"])
-    .agg(
-        mean_perc_matches_wins=("%_matches_wins", "mean"),
-        number_of_tests=("%_matches_wins", "count"),
-        mean_comp_wins=("competitions_wins", "mean")
-    )
-    .reset_index()
-  )
+  # media e numero di test per ogni accoppiamento, già aggiornati a ogni risultato
+  means = ResultsStore().aggregates()
   print(means)
-  means.to_csv("risultati_aggregati.csv", index=False)
-
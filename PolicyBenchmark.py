@@ -0,0 +1,156 @@
+import argparse
+import json
+import os
+import pickle
+import subprocess
+import time
+from copy import deepcopy
+
+from bots.AlphaBetaPolicy import AlphaBetaPolicy
+from bots.FastSim import differential_test
+from bots.MixedPolicy import MixedPolicy
+from bots.GreedyPolicy import GreedyPolicy
+from bots.Seeding import seed_battle, seed_global
+
+from vgc.engine.PkmBattleEnv import PkmBattleEnv
+from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
+from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
+
+# Benchmark delle policy su un insieme fisso di posizioni: ogni posizione è un GameState
+# preso da battaglie Greedy contro Greedy giocate con un roster a seed fisso (inizio
+# battaglia e snapshot ogni SNAPSHOT_EVERY turni). Per ogni policy e profondità si misurano
+# tempo di get_action, nodi al secondo e azioni scelte; i risultati si salvano in JSON e
+# si confrontano con quelli di un altro commit.
+
+CORPUS_PATH = 'benchmarks/positions.pkl'
+N_BATTLES = 10
+SNAPSHOT_EVERY = 3
+MAX_TURNS = 60
+
+# (nome, costruttore, profondità); Greedy non ha profondità
+POLICIES = [
+  ('Greedy', lambda depth: GreedyPolicy(), [0]),
+  ('AlphaBeta', lambda depth: AlphaBetaPolicy(depth), [2, 4, 6]),
+  ('Mixed', lambda depth: MixedPolicy(depth), [2, 4, 6]),
+]
+
+def build_corpus(seed: int = 0, n_battles: int = N_BATTLES) -> list:
+  seed_global(seed)
+  roster = RandomPkmRosterGenerator().gen_roster()
+  tg = RandomTeamFromRoster(roster)
+  players = [GreedyPolicy(), GreedyPolicy()]
+  positions = []
+  for battle in range(n_battles):
+    teams = (tg.get_team().get_battle_team([0, 1, 2]), tg.get_team().get_battle_team([0, 1, 2]))
+    seed_battle(seed + battle)
+    env = PkmBattleEnv(teams, encode=(False, False))
+    states, _ = env.reset()
+    for turn in range(MAX_TURNS):
+      if turn % SNAPSHOT_EVERY == 0:
+        positions.append(deepcopy(states[0]))
+      states, _, terminated, _, _ = env.step([players[0].get_action(states[0]), players[1].get_action(states[1])])
+      if terminated:
+        break
+  return positions
+
+def load_corpus(path: str = CORPUS_PATH, seed: int = 0) -> list:
+  # il corpus viene generato una volta e poi riletto, così resta identico tra i commit
+  if os.path.exists(path):
+    with open(path, 'rb') as f:
+      return pickle.load(f)
+  positions = build_corpus(seed)
+  os.makedirs(os.path.dirname(path), exist_ok=True)
+  with open(path, 'wb') as f:
+    pickle.dump(positions, f)
+  return positions
+
+def bench_policy(policy, positions: list, n_repeats: int = 3) -> dict:
+  times = []
+  nodes = 0
+  actions = []
+  for i, position in enumerate(positions):
+    best = None
+    for _ in range(n_repeats):
+      # get_action modifica lo stato (stima delle mosse) e la policy (TT, killer):
+      # ogni ripetizione parte dalla stessa copia e dallo stesso seed
+      g = deepcopy(position)
+      seed_battle(i, [policy])
+      start = time.perf_counter()
+      action = policy.get_action(g)
+      elapsed = time.perf_counter() - start
+      best = elapsed if best is None else min(best, elapsed)
+    times.append(best)
+    actions.append(action)
+    if hasattr(policy, 'search_stats'):
+      nodes += policy.search_stats()['nodes']
+  total = sum(times)
+  return {'positions': len(positions), 'total_s': total, 'mean_ms': total / len(positions) * 1000,
+          'max_ms': max(times) * 1000, 'nodes': nodes, 'nodes_per_sec': nodes / total if total > 0 else 0.,
+          'actions': actions}
+
+def run(positions: list, n_repeats: int = 3) -> dict:
+  results = {}
+  for name, make, depths in POLICIES:
+    for depth in depths:
+      policy = make(depth)
+      results[f'{name}/{depth}'] = bench_policy(policy, positions, n_repeats)
+      policy.close()
+  return results
+
+def git_commit() -> str:
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+  except (OSError, subprocess.CalledProcessError):
+    return 'unknown'
+
+def compare(baseline: dict, current: dict, threshold: float = 0.1) -> list:
+  # righe di report: variazioni di tempo oltre la soglia e posizioni con azione diversa
+  lines = []
+  for key, result in current['results'].items():
+    if key not in baseline['results']:
+      lines.append(f'{key}: new')
+      continue
+    old = baseline['results'][key]
+    ratio = result['total_s'] / old['total_s'] if old['total_s'] > 0 else 1.
+    if ratio > 1 + threshold:
+      lines.append(f'{key}: SLOWER {ratio:.2f}x ({old["mean_ms"]:.2f} -> {result["mean_ms"]:.2f} ms/move)')
+    elif ratio < 1 - threshold:
+      lines.append(f'{key}: faster {1/ratio:.2f}x ({old["mean_ms"]:.2f} -> {result["mean_ms"]:.2f} ms/move)')
+    changed = [i for i, (a, b) in enumerate(zip(old['actions'], result['actions'])) if a != b]
+    if changed:
+      lines.append(f'{key}: ACTIONS CHANGED in {len(changed)}/{len(result["actions"])} positions {changed[:10]}')
+  return lines
+
+def main():
+  parser = argparse.ArgumentParser(description='Benchmark of get_action on a fixed corpus of positions')
+  parser.add_argument('--corpus', default=CORPUS_PATH)
+  parser.add_argument('--out', default=None, help='results file (default benchmarks/<commit>.json)')
+  parser.add_argument('--baseline', default=None, help='results of another commit to compare with')
+  parser.add_argument('--repeats', type=int, default=3)
+  parser.add_argument('--threshold', type=float, default=0.1)
+  parser.add_argument('--fastsim', type=int, default=0, metavar='N',
+                      help='instead of the benchmark, compare bots/FastSim.py with GameState.step on N variants of each position')
+  args = parser.parse_args()
+
+  positions = load_corpus(args.corpus)
+  if args.fastsim > 0:
+    print(json.dumps(differential_test(positions, args.fastsim), indent=2))
+    return
+  commit = git_commit()
+  current = {'commit': commit, 'corpus': args.corpus, 'results': run(positions, args.repeats)}
+  out = args.out if args.out is not None else os.path.join('benchmarks', f'{commit}.json')
+  os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+  with open(out, 'w') as f:
+    json.dump(current, f, indent=2)
+
+  for key, result in current['results'].items():
+    print(f'{key}: {result["mean_ms"]:.2f} ms/move, {result["nodes_per_sec"]:.0f} nodes/s')
+  if args.baseline is not None:
+    with open(args.baseline) as f:
+      baseline = json.load(f)
+    lines = compare(baseline, current, args.threshold)
+    print(f'compared with {baseline["commit"]}:')
+    print('\n'.join(lines) if lines else 'no changes')
+
+if __name__=='__main__':
+  main()
@@ -0,0 +1,109 @@
+import json
+import os
+from contextlib import contextmanager
+
+import pandas as pd
+
+try:
+  import fcntl
+except ImportError:
+  fcntl = None
+  import msvcrt
+
+KEY_COLUMNS = ["opp_policy", "our_policy", "max_depth"]
+ROW_COLUMNS = ["our_policy", "opp_policy", "max_depth", "%_matches_wins", "competitions_wins"]
+
+def make_row(our_policy, opp_policy, max_depth, perc_matches_wins, competitions_wins):
+  return {"our_policy": str(our_policy), "opp_policy": str(opp_policy), "max_depth": float(max_depth),
+          "%_matches_wins": float(perc_matches_wins), "competitions_wins": int(competitions_wins)}
+
+@contextmanager
+def file_lock(path):
+  # lock esclusivo su un file accanto allo store, così più tester possono scrivere insieme
+  with open(path, 'a+') as f:
+    if fcntl is not None:
+      fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+      f.seek(0)
+      msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+    try:
+      yield
+    finally:
+      if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+      else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class ResultsStore():
+  # Ogni risultato è una riga JSON aggiunta in coda a results.jsonl, senza rileggere lo storico.
+  # Le medie per (opp_policy, our_policy, max_depth), senza le righe parziali, sono tenute in results_aggregates.json come
+  # somme e conteggi, aggiornate a ogni riga, e da lì viene riscritto risultati_aggregati.csv.
+
+  def __init__(self, path='results.jsonl', aggregates_path='results_aggregates.json',
+      aggregates_csv='risultati_aggregati.csv', legacy_csv='results.csv'):
+    self.path = path
+    self.aggregates_path = aggregates_path
+    self.aggregates_csv = aggregates_csv
+    self.lock_path = path + '.lock'
+    # alla prima esecuzione lo storico di results.csv viene importato una volta sola
+    if legacy_csv is not None and not os.path.exists(path) and os.path.exists(legacy_csv):
+      with file_lock(self.lock_path):
+        if not os.path.exists(path):
+          legacy = pd.read_csv(legacy_csv)
+          self._append_rows([make_row(*values) for values in legacy[ROW_COLUMNS].itertuples(index=False)])
+
+  def append(self, our_policy, opp_policy, max_depth, perc_matches_wins, competitions_wins, **extra):
+    row = make_row(our_policy, opp_policy, max_depth, perc_matches_wins, competitions_wins)
+    row.update(extra)
+    with file_lock(self.lock_path):
+      self._append_rows([row])
+
+  def _append_rows(self, rows):
+    with open(self.path, 'a') as f:
+      for row in rows:
+        f.write(json.dumps(row) + '\n')
+    aggregates = self._load_aggregates()
+    for row in rows:
+      if row["max_depth"] != row["max_depth"]:
+        # come nel groupby di pandas, le righe senza profondità non entrano nelle medie
+        continue
+      if row.get("partial"):
+        # una cella interrotta resta nello storico ma non entra nelle medie
+        continue
+      key = json.dumps([row[c] for c in KEY_COLUMNS])
+      total = aggregates.setdefault(key, {"sum_perc_matches_wins": 0., "sum_comp_wins": 0., "number_of_tests": 0})
+      total["sum_perc_matches_wins"] += row["%_matches_wins"]
+      total["sum_comp_wins"] += row["competitions_wins"]
+      total["number_of_tests"] += 1
+    tmp_path = self.aggregates_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+      json.dump(aggregates, f, indent=2)
+    os.replace(tmp_path, self.aggregates_path)
+    if self.aggregates_csv is not None:
+      self._means(aggregates).to_csv(self.aggregates_csv, index=False)
+
+  def _load_aggregates(self):
+    if not os.path.exists(self.aggregates_path):
+      return {}
+    with open(self.aggregates_path) as f:
+      return json.load(f)
+
+  def _means(self, aggregates):
+    rows = []
+    for key, total in aggregates.items():
+      opp_policy, our_policy, max_depth = json.loads(key)
+      n = total["number_of_tests"]
+      rows.append({"opp_policy": opp_policy, "our_policy": our_policy, "max_depth": max_depth,
+                   "mean_perc_matches_wins": total["sum_perc_matches_wins"] / n,
+                   "number_of_tests": n,
+                   "mean_comp_wins": total["sum_comp_wins"] / n})
+    columns = KEY_COLUMNS + ["mean_perc_matches_wins", "number_of_tests", "mean_comp_wins"]
+    return pd.DataFrame(rows, columns=columns).sort_values(KEY_COLUMNS).reset_index(drop=True)
+
+  def aggregates(self):
+    return self._means(self._load_aggregates())
+
+  def rows(self):
+    # tutto lo storico, solo quando serve davvero
+    return pd.read_json(self.path, lines=True)
@@ -0,0 +1,84 @@
+import random
+import timeit
+from typing import List
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmStat, PkmType, WeatherCondition
+from vgc.datatypes.Objects import PkmMove
+from vgc.datatypes.Constants import TYPE_CHART_MULTIPLIER
+from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
+
+from bots.PkmTables import match_up_eval, calculate_damage
+
+# versioni precedenti (ricalcolo a ogni chiamata), tenute come riferimento per il confronto
+
+def reference_match_up_eval(my_pkm_type: PkmType,
+      opp_pkm_type: PkmType,
+      my_moves_type: List[PkmType],
+      opp_moves_type: List[PkmType]
+  ) -> float:
+  defensive_match_up = 0.
+  for mtype in opp_moves_type:
+    if mtype == opp_pkm_type:
+      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type]*1.5, defensive_match_up)
+    else:
+      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], defensive_match_up)
+  offensive_match_up = 0.
+  for mtype in my_moves_type:
+    if mtype == opp_pkm_type:
+      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][opp_pkm_type]*1.5, offensive_match_up)
+    else:
+      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], offensive_match_up)
+  return offensive_match_up - defensive_match_up
+
+def reference_calculate_damage(move: PkmMove, pkm_type: PkmType, opp_pkm_type: PkmType, attack_stage: int, defense_stage: int, weather: WeatherCondition) -> float:
+  if move.pp <= 0:
+    return 0
+  if move.name is None:
+    return 0
+  move_type: PkmType = move.type
+  move_power: float = move.power
+  type_rate = TYPE_CHART_MULTIPLIER[move_type][opp_pkm_type]
+  if type_rate == 0:
+    return 0
+  if move.fixed_damage > 0:
+    return move.fixed_damage
+  stab = 1.5 if move_type == pkm_type else 1.
+  if (move_type == PkmType.WATER and weather == WeatherCondition.RAIN) or (
+          move_type == PkmType.FIRE and weather == WeatherCondition.SUNNY):
+    weather = 1.5
+  elif (move_type == PkmType.WATER and weather == WeatherCondition.SUNNY) or (
+          move_type == PkmType.FIRE and weather == WeatherCondition.RAIN):
+    weather = .5
+  else:
+    weather = 1.
+  stage_level = attack_stage - defense_stage
+  stage = (stage_level + 2.) / 2 if stage_level >= 0. else 2. / (np.abs(stage_level) + 2.)
+  return type_rate * stab * weather * stage * move_power
+
+def main():
+  n_cases: int = 2000
+  n_repeats: int = 20
+  rng = random.Random(0)
+  types = list(PkmType)
+  weathers = list(WeatherCondition)
+  match_ups = [(rng.choice(types), rng.choice(types), [rng.choice(types) for _ in range(4)], [rng.choice(types) for _ in range(rng.randint(0, 4))])
+               for _ in range(n_cases)]
+  damages = [(rng.choice(STANDARD_MOVE_ROSTER), rng.choice(types), rng.choice(types), rng.randint(-5, 5), rng.randint(-5, 5), rng.choice(weathers))
+             for _ in range(n_cases)]
+
+  # prima di misurare controllo che i risultati coincidano
+  for args in match_ups:
+    assert abs(match_up_eval(*args) - reference_match_up_eval(*args)) < 1e-9, args
+  for args in damages:
+    assert abs(calculate_damage(*args) - reference_calculate_damage(*args)) < 1e-9, args
+
+  for name, new, old, cases in [('match_up_eval', match_up_eval, reference_match_up_eval, match_ups),
+                                ('calculate_damage', calculate_damage, reference_calculate_damage, damages)]:
+    t_new = min(timeit.repeat(lambda: [new(*args) for args in cases], number=1, repeat=n_repeats))
+    t_old = min(timeit.repeat(lambda: [old(*args) for args in cases], number=1, repeat=n_repeats))
+    print(f'{name}: tables {t_new/n_cases*1e6:.3f} us/call, reference {t_old/n_cases*1e6:.3f} us/call, speed-up {t_old/t_new:.2f}x')
+
+if __name__=='__main__':
+  main()
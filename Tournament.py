@@ -5,17 +5,26 @@ from bots.AlphaBetaPolicy import AlphaBetaPolicy
 from bots.MixedPolicy import MixedPolicy
 from bots.GreedyPolicy import GreedyPolicy
 from bots.fCompetitor import fCompetitor
+from bots.DecisionCache import DecisionCache, CachedPolicy
+from bots.Profiling import Profiler
+from bots.Seeding import battle_seed, seed_battle, seed_global
 from bots.Thunder_BattlePolicies import ThunderPlayer
 from bots.hayo5 import hayo5_BattlePolicy
+from TrajectoryRecorder import TrajectoryRecorder
 
 from vgc.competition.BattleMatch import BattleMatch
 from vgc.competition.Competitor import CompetitorManager
 from vgc.util.generator.PkmRosterGenerators import RandomPkmRosterGenerator
 from vgc.util.generator.PkmTeamGenerators import RandomTeamFromRoster
 
+from vgc.behaviour import BattlePolicy
 from vgc.behaviour.BattlePolicies import TerminalPlayer, Minimax, PrunedBFS
 import pandas as pd
 import multiprocessing
+import json
+import os
+import time
+from collections import namedtuple
 from itertools import combinations
 
 def main():
@@ -30,16 +39,19 @@ def main():
     c9 = fCompetitor('Player9') #Mixed (6.0)
     c10 = fCompetitor('Player10') #AlphaBeta (2.0)
 
+    # decisioni di inizio battaglia salvate su disco, condivise tra i worker e tra i tornei
+    cache = DecisionCache()
+
     #assing policies to competitors
     c1._battle_policy = GreedyPolicy()
-    c2._battle_policy = AlphaBetaPolicy(4)
+    c2._battle_policy = CachedPolicy(AlphaBetaPolicy(4), cache)
     c3._battle_policy = MixedPolicy(2)
     c4._battle_policy = MixedPolicy(4)
     c5._battle_policy = PrunedBFS()
     c6._battle_policy = Minimax()
     c7._battle_policy = ThunderPlayer()
     c8._battle_policy = hayo5_BattlePolicy()
-    c9._battle_policy = MixedPolicy(6)
+    c9._battle_policy = CachedPolicy(MixedPolicy(6), cache)
     c10._battle_policy = AlphaBetaPolicy(2)
 
     cm1 = CompetitorManager(c1)
@@ -53,6 +65,8 @@ def main():
     cm9 = CompetitorManager(c9)
     cm10 = CompetitorManager(c10)
     
+    # roster e team dipendono solo dal seed principale
+    seed_global(0)
     roster = RandomPkmRosterGenerator().gen_roster()
     tg = RandomTeamFromRoster(roster)
 
@@ -72,54 +86,266 @@ def main():
     
     results = T.start_tournament()
     print(f"Results: {results}")
-    df = pd.DataFrame(list(results.items()), columns=['Policy', 'Score'])
-    standings = df.sort_values(["Score"], ascending=False).reset_index(drop=True)
-    standings.index = standings.index + 1
+    standings = T.standings()
     print(standings)
     standings.to_csv('tournament7.csv', index_label="Rank")
 
+# stato dei worker: policy e team di ogni concorrente, ricevuti all'avvio del pool e di nuovo
+# solo quando un torneo usa un altro insieme di concorrenti
+_entries = {}
+# registratore delle traiettorie del worker, None se la registrazione è spenta
+_recorder = None
+# profiler del worker, None se il profiling è spento
+_profiler = None
+# barriera comune a tutti i worker del pool, per installare i concorrenti una volta per worker
+_barrier = None
+
+def competitor_entries(competitors):
+    return {name: (cm.competitor.battle_policy, cm.team) for cm, name in competitors}
+
+def init_worker(entries, record=None, profile=False, barrier=None):
+    global _entries, _recorder, _profiler, _barrier
+    _entries = entries
+    _recorder = TrajectoryRecorder(record) if record is not None else None
+    _profiler = Profiler() if profile else None
+    _barrier = barrier
+
+def install_entries(entries):
+    # un task per worker: ognuno aspetta alla barriera, così nessun worker ne prende due
+    global _entries
+    _entries = entries
+    _barrier.wait()
+
+def battle_match(cm0, cm1, debug=False):
+    match = BattleMatch(cm0, cm1, debug=debug)
+    match.run()
+    return match.winner()
+
+# una singola battaglia: i due concorrenti, il lato dello scambio dei team (0 o 1),
+# l'indice della battaglia nell'accoppiamento e il seed
+BattleSpec = namedtuple('BattleSpec', ['pairing', 'name_i', 'name_j', 'side', 'index', 'seed'])
+
+N_BATTLES_PER_SIDE = 5
+
+def battle_index(spec):
+    # posizione della battaglia in Tournament.battle_specs
+    return (spec.pairing*2 + spec.side)*N_BATTLES_PER_SIDE + spec.index
+
+class TimedPolicy(BattlePolicy):
+    # somma la durata delle get_action di un concorrente durante una battaglia
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.elapsed = 0.
+
+    def get_action(self, g):
+        start = time.perf_counter()
+        action = self.policy.get_action(g)
+        self.elapsed += time.perf_counter() - start
+        return action
+
+    def close(self):
+        self.policy.close()
+
+def play_battle(spec):
+    # il worker ricostruisce localmente i due concorrenti a partire dai loro nomi
+    cms = []
+    policies = []
+    timers = []
+    for side, name in enumerate((spec.name_i, spec.name_j)):
+        policy, team = _entries[name]
+        policies.append(policy)
+        policy = TimedPolicy(policy)
+        timers.append(policy)
+        if _profiler is not None:
+            policy = _profiler.wrap(policy, name)
+        if _recorder is not None:
+            policy = _recorder.wrap(policy, side)
+        c = fCompetitor(name)
+        c._battle_policy = policy
+        cm = CompetitorManager(c)
+        cm.team = team
+        cms.append(cm)
+    cm_i, cm_j = cms
+    if spec.side == 1:
+        #switch teams
+        cm_i.team, cm_j.team = cm_j.team, cm_i.team
+    seed_battle(spec.seed, policies)
+    if _recorder is not None:
+        _recorder.begin_battle(battle_index(spec), spec.seed)
+    start = time.perf_counter()
+    winner = battle_match(cm_i, cm_j)
+    if _recorder is not None:
+        _recorder.end_battle(winner)
+    duration = time.perf_counter() - start
+    # i campioni del profiling tornano al processo principale insieme al risultato
+    samples = _profiler.take() if _profiler is not None else None
+    return spec, winner, duration, samples, tuple(timer.elapsed for timer in timers)
+
+class BattleCosts():
+    # stima del costo (secondi per battaglia) di ogni concorrente, imparata dai tornei precedenti
+    # e salvata su file; il costo di una battaglia è la somma dei costi dei due concorrenti.
+    # A ogni concorrente si addebita il tempo delle proprie get_action più metà del resto
+    # della battaglia (motore), così le due quote sommano alla durata della battaglia
+
+    def __init__(self, path='battle_costs.json'):
+        self.path = path
+        self.costs = {}
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self.costs = json.load(f)
+
+    def estimate(self, name):
+        if name in self.costs:
+            total, n = self.costs[name]
+            return total / n
+        # un concorrente mai visto viene considerato lento, così parte tra i primi
+        return max([total / n for total, n in self.costs.values()], default=1.)
+
+    def battle_estimate(self, spec):
+        return self.estimate(spec.name_i) + self.estimate(spec.name_j)
+
+    def update(self, spec, duration, elapsed=(0., 0.)):
+        # elapsed: tempo delle get_action dei due concorrenti (name_i, name_j)
+        engine = max(duration - sum(elapsed), 0.)
+        for name, own in zip((spec.name_i, spec.name_j), elapsed):
+            total, n = self.costs.get(name, (0., 0))
+            self.costs[name] = (total + own + engine / 2, n + 1)
+
+    def save(self):
+        if self.path is not None:
+            with open(self.path, 'w') as f:
+                json.dump(self.costs, f, indent=2)
+
+def same_entries(entries, other):
+    # stessi concorrenti: stessi nomi con gli stessi oggetti policy e team
+    return entries.keys() == other.keys() and all(
+        entries[name][0] is other[name][0] and entries[name][1] is other[name][1] for name in entries)
+
+class TournamentExecutor():
+    # pool persistente: i worker restano caldi tra un torneo e l'altro e ricevono
+    # per ogni battaglia solo una BattleSpec; un torneo con altri concorrenti li installa
+    # prima di partire (install)
+
+    def __init__(self, competitors, processes=None, record=None, profile=False):
+        self.processes = processes if processes is not None else os.cpu_count()
+        self.entries = competitor_entries(competitors)
+        barrier = multiprocessing.Barrier(self.processes)
+        self.pool = multiprocessing.Pool(self.processes, initializer=init_worker,
+                                         initargs=(self.entries, record, profile, barrier))
+
+    def install(self, competitors):
+        entries = competitor_entries(competitors)
+        if same_entries(entries, self.entries):
+            return
+        self.pool.map(install_entries, [entries] * self.processes, chunksize=1)
+        self.entries = entries
+
+    def run(self, specs):
+        # le battaglie vengono distribuite una alla volta nell'ordine dato,
+        # i risultati arrivano appena una battaglia finisce
+        return self.pool.imap_unordered(play_battle, specs, chunksize=1)
+
+    def close(self):
+        self.pool.close()
+        self.pool.join()
+
+class SerialExecutor():
+    # stessa interfaccia di TournamentExecutor, ma gioca le battaglie nel processo corrente
+
+    def __init__(self, competitors, record=None, profile=False):
+        init_worker(competitor_entries(competitors), record, profile)
+
+    def install(self, competitors):
+        global _entries
+        _entries = competitor_entries(competitors)
+
+    def run(self, specs):
+        return map(play_battle, specs)
+
+    def close(self):
+        pass
+
 class Tournament():
 
-    def __init__(self, competitors):
+    def __init__(self, competitors, executor=None, costs=None, seed=0, record=None, profile=False):
         policies = [i[1] for i in competitors]
         count = [0] * len(competitors)
         self.results = dict(zip(policies, count))  
         print(self.results)
         self.c = competitors
+        self.executor = executor
+        self.costs = costs if costs is not None else BattleCosts()
+        self.seed = seed
+        # cartella in cui registrare le traiettorie delle battaglie (None: nessuna registrazione)
+        self.record = record
+        # con profile=True vengono misurati durata e lavoro di ogni get_action
+        self.profiler = Profiler() if profile else None
             
     def battle_match(self, team1, team2, debug=False):
-        match = BattleMatch(team1, team2, debug=debug)
-        match.run()
-        return match.winner()
-    
-    def battle_worker(self, pair):
-        i, j = pair
-        wins_i = 0
-        wins_j = 0
-        for _ in range(2):  
-            for _ in range(5):  
-                winner = self.battle_match(i[0], j[0])
-                if winner == 0:
-                    wins_i += 1
-                elif winner == 1:
-                    wins_j += 1
-            #switch teams
-            i[0].team, j[0].team = j[0].team, i[0].team
-        print("Match finished")
-        return([i[1],wins_i], [j[1],wins_j])
+        return battle_match(team1, team2, debug)
 
+    def standings(self):
+        df = pd.DataFrame(list(self.results.items()), columns=['Policy', 'Score'])
+        standings = df.sort_values(["Score"], ascending=False).reset_index(drop=True)
+        standings.index = standings.index + 1
+        return standings
     
+    def battle_specs(self):
+        specs = []
+        for pairing, (i, j) in enumerate(combinations(self.c, 2)):
+            for side in range(2):
+                for index in range(N_BATTLES_PER_SIDE):
+                    seed = battle_seed(self.seed, len(specs))
+                    specs.append(BattleSpec(pairing, i[1], j[1], side, index, seed))
+        return specs
+
+    def replay_battle(self, spec):
+        # rigioca da sola una battaglia del torneo (stesso seed, stessi team), nel processo corrente
+        SerialExecutor(self.c)
+        return play_battle(spec)[:3]
+
     def start_tournament(self):
         print("Starting tournament...")
-        team_combinations = list(combinations(self.c, 2))
-        with multiprocessing.Pool() as pool:
-            partial_results = pool.map(self.battle_worker, team_combinations)
-            print(partial_results)
+        specs = self.battle_specs()
+        # le battaglie più lunghe partono per prime, così alla fine non resta un solo core occupato
+        specs.sort(key=self.costs.battle_estimate, reverse=True)
+        n_pairings = len(specs) // (2*N_BATTLES_PER_SIDE)
+        pairing_wins = {}
+        pairing_played = {}
+        finished = 0
+        executor = self.executor
+        if executor is None:
+            executor = TournamentExecutor(self.c, record=self.record, profile=self.profiler is not None)
+        else:
+            # un executor condiviso può avere i concorrenti di un altro torneo
+            executor.install(self.c)
+        try:
+            for spec, winner, duration, samples, elapsed in executor.run(specs):
+                self.costs.update(spec, duration, elapsed)
+                if self.profiler is not None and samples is not None:
+                    self.profiler.merge(samples)
+                wins = pairing_wins.setdefault(spec.pairing, [0, 0])
+                if winner == 0:
+                    wins[0] += 1
+                elif winner == 1:
+                    wins[1] += 1
+                pairing_played[spec.pairing] = pairing_played.get(spec.pairing, 0) + 1
+                # un accoppiamento si chiude quando tutte le sue battaglie sono arrivate
+                if pairing_played[spec.pairing] == 2*N_BATTLES_PER_SIDE:
+                    finished += 1
+                    self.results[spec.name_i] += wins[0]
+                    self.results[spec.name_j] += wins[1]
+                    print(f"Match finished ({finished}/{n_pairings}): {spec.name_i} {wins[0]} - {wins[1]} {spec.name_j}")
+                    print(self.standings())
+        finally:
+            if self.executor is None:
+                executor.close()
+            self.costs.save()
         print("Tournament finished.")
-
-        for res in partial_results:
-            self.results[res[0][0]] += res[0][1]
-            self.results[res[1][0]] += res[1][1]
+        if self.profiler is not None:
+            print(self.profiler.report().to_string(index=False))
+            print(f"Search time saved by the fast tiers: {self.profiler.saved_time():.1f}s")
         return self.results
 
 if __name__=='__main__':
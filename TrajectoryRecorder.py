@@ -0,0 +1,131 @@
+import glob
+import os
+import time
+
+import numpy as np
+
+from vgc.behaviour import BattlePolicy
+from vgc.datatypes.Objects import GameState
+
+# Un record fisso per turno (51 byte): azioni congiunte, tempo di decisione delle due policy
+# e un riassunto dello stato visto dal giocatore 0 (hp di attivo e party dei due team,
+# stage, status e tipo degli attivi, meteo). I turni di una battaglia sono contigui nel file
+# .traj, e il file .idx ha un record per battaglia con seed, vincitore e posizione dei turni.
+TURN_DTYPE = np.dtype([
+  ('battle', '<u4'),
+  ('turn', '<u2'),
+  ('action', 'i1', 2),
+  ('time', '<f4', 2),
+  ('hp', '<f4', 6),
+  ('stage', 'i1', 6),
+  ('status', 'u1', 2),
+  ('type', 'u1', 2),
+  ('weather', 'u1')
+])
+
+BATTLE_DTYPE = np.dtype([
+  ('battle', '<u4'),
+  ('seed', '<u8'),
+  ('first_turn', '<u8'),
+  ('n_turns', '<u4'),
+  ('winner', 'i1')
+])
+
+def state_summary(g: GameState) -> tuple:
+  my_team = g.teams[0]
+  opp_team = g.teams[1]
+  hp = [pkm.hp for team in (my_team, opp_team) for pkm in [team.active] + list(team.party)]
+  hp += [0.] * (6 - len(hp))
+  return (hp, list(my_team.stage) + list(opp_team.stage),
+          (int(my_team.active.status), int(opp_team.active.status)),
+          (int(my_team.active.type), int(opp_team.active.type)),
+          int(g.weather.condition))
+
+class RecordingPolicy(BattlePolicy):
+  # avvolge una policy e passa al recorder stato, azione e tempo di ogni decisione
+
+  def __init__(self, policy: BattlePolicy, recorder, side: int):
+    self.policy = policy
+    self.recorder = recorder
+    self.side = side
+
+  def get_action(self, g: GameState) -> int:
+    start = time.perf_counter()
+    action = self.policy.get_action(g)
+    self.recorder.record(self.side, g, action, time.perf_counter() - start)
+    return action
+
+  def close(self):
+    self.policy.close()
+
+class TrajectoryRecorder():
+  # I turni vengono tenuti in memoria durante la battaglia e scritti in blocco alla fine,
+  # così il costo sul ciclo di gioco è un tuple append per decisione. Ogni processo scrive
+  # i propri file (suffisso pid), quindi i worker di un torneo non si contendono i file.
+
+  def __init__(self, directory: str = 'trajectories'):
+    self.directory = directory
+    os.makedirs(directory, exist_ok=True)
+    self._battle = None
+
+  def _paths(self) -> tuple:
+    base = os.path.join(self.directory, f'worker-{os.getpid()}')
+    return base + '.traj', base + '.idx'
+
+  def wrap(self, policy: BattlePolicy, side: int) -> RecordingPolicy:
+    return RecordingPolicy(policy, self, side)
+
+  def begin_battle(self, battle: int, seed: int = 0) -> None:
+    self._battle = (battle, seed)
+    self._turns = [[], []]
+
+  def record(self, side: int, g: GameState, action: int, elapsed: float) -> None:
+    if self._battle is None:
+      return
+    # il riassunto dello stato viene preso solo dal punto di vista del giocatore 0
+    summary = state_summary(g) if side == 0 else None
+    self._turns[side].append((action, elapsed, summary))
+
+  def end_battle(self, winner: int) -> None:
+    battle, seed = self._battle
+    self._battle = None
+    turns0, turns1 = self._turns
+    n_turns = max(len(turns0), len(turns1))
+    records = np.zeros(n_turns, dtype=TURN_DTYPE)
+    for t in range(n_turns):
+      action0, time0, summary = turns0[t] if t < len(turns0) else (-1, 0., None)
+      action1, time1, _ = turns1[t] if t < len(turns1) else (-1, 0., None)
+      record = records[t]
+      record['battle'] = battle
+      record['turn'] = t
+      record['action'] = (-1 if action0 is None else action0, -1 if action1 is None else action1)
+      record['time'] = (time0, time1)
+      if summary is not None:
+        record['hp'], record['stage'], record['status'], record['type'], record['weather'] = summary
+    traj_path, idx_path = self._paths()
+    first_turn = os.path.getsize(traj_path) // TURN_DTYPE.itemsize if os.path.exists(traj_path) else 0
+    with open(traj_path, 'ab') as f:
+      records.tofile(f)
+    index = np.array([(battle, seed, first_turn, n_turns, -1 if winner is None else winner)], dtype=BATTLE_DTYPE)
+    with open(idx_path, 'ab') as f:
+      index.tofile(f)
+
+class TrajectoryReader():
+  # lettura in blocco con memory map: i file non vengono caricati in memoria
+
+  def __init__(self, directory: str = 'trajectories'):
+    self.files = []
+    for idx_path in sorted(glob.glob(os.path.join(directory, '*.idx'))):
+      traj_path = idx_path[:-len('.idx')] + '.traj'
+      if os.path.getsize(idx_path) == 0 or os.path.getsize(traj_path) == 0:
+        continue
+      self.files.append((np.memmap(idx_path, dtype=BATTLE_DTYPE, mode='r'),
+                         np.memmap(traj_path, dtype=TURN_DTYPE, mode='r')))
+
+  def battles(self):
+    for battles, turns in self.files:
+      for battle in battles:
+        yield battle, turns[battle['first_turn']:battle['first_turn'] + battle['n_turns']]
+
+  def all_turns(self) -> np.ndarray:
+    return np.concatenate([turns for _, turns in self.files]) if self.files else np.zeros(0, dtype=TURN_DTYPE)
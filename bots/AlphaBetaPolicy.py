@@ -1,70 +1,42 @@
 from typing import Any, List, Union
-from copy import deepcopy
 
 import math
 import numpy as np
 import random
+import time
 
 from vgc.behaviour import BattlePolicy
 from vgc.datatypes.Types import PkmStatus
 from vgc.datatypes.Objects import GameState, PkmTeam, PkmType, Pkm
 from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
-from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
+
+from bots.PkmTables import match_up_eval
+from bots.SearchState import SearchState
+from bots.ChanceNodes import EvalBounds, joint_outcomes, force_outcome, restore_outcome
+from bots.MoveOrdering import MoveOrderer
+from bots.OpponentBelief import OpponentBelief
+from bots.ParallelSearch import RootSplitter, SampleSearcher
+from bots.TranspositionTable import (TranspositionTable, ZobristHasher, state_features, step_actives, changed_parts,
+                                     update_features, EXACT, LOWER, UPPER)
 
 class Node():
+  # nodo compatto: niente __dict__ né puntatore al padre (la ricorsione tiene già il percorso),
+  # lo stato è l'unica copia della ricerca, condivisa da tutti i nodi
+  __slots__ = ('action', 'gameState', 'depth', 'value', 'features', 'key', 'on_pv', 'terms')
 
   def __init__(self):
     self.action: int = None
     self.gameState: GameState = None
-    self.parent: Node = None
     self.depth: int = 0
     self.value: float = 0.
+    self.features: tuple = None
+    self.key: int = 0
+    self.on_pv: bool = False
+    self.terms: tuple = None
 
   def __str__(self):
-    return f'Node(action: {self.action}, depth: {self.depth}, value: {self.value}, parent: {str(self.parent)})'
+    return f'Node(action: {self.action}, depth: {self.depth}, value: {self.value})'
   
-def match_up_eval(my_pkm_type: PkmType,
-      opp_pkm_type: PkmType,
-      my_moves_type: List[PkmType],
-      opp_moves_type: List[PkmType]
-  ) -> float:
-  # determine defensive match up
-  defensive_match_up = 0.
-  for mtype in opp_moves_type:
-    if mtype == opp_pkm_type:
-      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type]*1.5, defensive_match_up)
-    else:
-      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], defensive_match_up)
-  #print(f'DEFENSIVE MATCH UP: {defensive_match_up}')
-
-  offensive_match_up = 0.
-  for mtype in my_moves_type:
-    if mtype == opp_pkm_type:
-      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][opp_pkm_type]*1.5, offensive_match_up)
-    else:
-      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], offensive_match_up)
-  #print(f'OFFENSIVE MATCH UP: {offensive_match_up}')
-    
-  return offensive_match_up - defensive_match_up
-
-def estimate_move(pkm: Pkm) -> None:
-  # controlla se è già presente una mossa del tipo del pokemon
-  type_m = sum([move.type==pkm.type for move in pkm.moves if move.name is not None])
-  for move_i in range(DEFAULT_N_ACTIONS-2):
-    if pkm.moves[move_i].name is None:
-      # se non è presente una mossa del tipo del pkm allora ne aggiungo una random
-      # prendo in considerazione solo mosse di attacco, che sono quelle che mi preoccupano di più
-      if type_m==0:
-        type_moves = [move for move in STANDARD_MOVE_ROSTER if move.type==pkm.type and move.power>0.0]
-        pkm.moves[move_i] = random.choice(type_moves)
-        type_m = 1
-      else:
-        # faccio in modo che sia diversa dalle mosse che ho già
-        move = random.choice(STANDARD_MOVE_ROSTER)
-        while(move in pkm.moves):
-          move = random.choice(STANDARD_MOVE_ROSTER)
-        pkm.moves[move_i] = move
-
 def status_eval(pkm: Pkm) -> float:
   if pkm.status == (PkmStatus.CONFUSED or PkmStatus.PARALYZED or PkmStatus.SLEEP or PkmStatus.FROZEN):
     return -1
@@ -103,6 +75,15 @@ def game_state_eval(g: GameState, depth: int):
           + (my_team.party[0].hp/my_team.party[0].max_hp+my_team.party[1].hp/my_team.party[1].max_hp)*2)
 # ma noi possiamo vedere la vita del party avversario?????
 
+class SearchTimeout(Exception):
+  pass
+
+def deepening_depths(max_depth: int) -> List[int]:
+  # profondità delle iterazioni: un turno (due ply) alla volta, l'ultima è sempre max_depth,
+  # anche se dispari, come nella ricerca a profondità fissa
+  max_depth = max(max_depth, 1)
+  return list(range(2, max_depth, 2)) + [max_depth]
+
 def n_fainted(team: PkmTeam) -> int:
   fainted = 0
   fainted += team.active.hp == 0
@@ -114,13 +95,82 @@ def n_fainted(team: PkmTeam) -> int:
 
 class AlphaBetaPolicy(BattlePolicy):
 
-  def __init__(self, max_depth: int = 6, seed: int = 69):
+  def __init__(self, max_depth: int = 6, seed: int = 69, tt_size: int = 2**16, time_budget: float = None,
+      move_ordering: bool = True, batch_eval: bool = False, n_workers: int = 1, parallel_min_depth: int = 4,
+      n_samples: int = 1, combine: str = 'average', sample_workers: int = 1, chance_nodes: bool = False,
+      star2: bool = False, incremental_eval: bool = True, eval_debug: bool = False):
     self.max_depth = max_depth
-    random.seed(seed)
+    # con time_budget (secondi per get_action) la ricerca approfondisce un turno alla volta
+    # fino a max_depth o allo scadere del tempo
+    self.time_budget = time_budget
+    self.completed_depth: int = 0
+    self._depth_limit: int = max_depth
+    self._deadline: float = None
+    self._pv: List[int] = []
+    self._pv_table: dict = {}
+    # a profondità fissa le risposte dell'avversario di un nodo min vengono applicate in sequenza
+    # sullo stesso stato, in ordine 0..5, come nella ricerca con una deepcopy per nodo min, così le
+    # azioni scelte restano quelle di prima; l'approfondimento iterativo le fa partire tutte dallo
+    # stesso stato, perché l'ordine della variante principale non cambi le posizioni valutate
+    self._replay_replies: bool = True
+    # generatore della policy, al posto di quello globale (vedi reseed)
+    self.rng: random.Random = random.Random(seed)
+    # mosse rivelate dall'avversario in questa battaglia e stima di quelle nascoste
+    self.belief: OpponentBelief = OpponentBelief()
+    # tabella delle trasposizioni condivisa tra le chiamate della stessa battaglia (tt_size=0 la disattiva)
+    self.tt: TranspositionTable = TranspositionTable(tt_size) if tt_size > 0 else None
+    self.hasher: ZobristHasher = ZobristHasher(seed)
+    # killer/history e stima dei danni per ordinare le azioni (move_ordering=False usa l'ordine 0..5)
+    self.orderer: MoveOrderer = MoveOrderer() if move_ordering else None
+    # con batch_eval le foglie sotto ai nodi min di frontiera che non possono tagliare (alpha = -inf,
+    # quindi tutte le risposte vengono visitate comunque) vengono valutate insieme con numpy
+    self.leaves = None
+    if batch_eval:
+      from bots.BatchEval import LeafBuffer
+      self.leaves = LeafBuffer()
+    # con chance_nodes dopo ogni coppia di azioni c'è un nodo di caso (colpita/mancata, effetto
+    # sì/no) con potatura Star1, più la fase di sondaggio Star2 se star2 è attivo (con i limiti
+    # larghi di game_state_eval il sondaggio costa più di quanto fa risparmiare, quindi è spento)
+    self.chance_nodes = chance_nodes
+    self.star2 = star2
+    self._bounds: EvalBounds = None
+    # con incremental_eval ogni nodo porta i termini della valutazione e dopo uno step si
+    # ricalcolano solo quelli toccati (bots/IncrementalEval.py); eval_debug li confronta
+    # a ogni foglia con game_state_eval
+    self.evaluator = None
+    if incremental_eval:
+      from bots.IncrementalEval import EvalAccumulator
+      self.evaluator = EvalAccumulator(eval_debug)
+    # contatori dell'ultima get_action, per misurare il guadagno del pruning
+    self.n_nodes: int = 0
+    self.n_leaves: int = 0
+    self.n_cutoffs: int = 0
+    self.max_ply: int = 0
+    self._search: SearchState = None
+    # con n_workers > 1 le azioni della radice vengono cercate da un pool di processi persistente,
+    # a partire da parallel_min_depth (sotto si usa la ricerca seriale)
+    self.splitter: RootSplitter = None
+    if n_workers > 1:
+      self.splitter = RootSplitter(n_workers, parallel_min_depth,
+          dict(max_depth=max_depth, seed=seed, tt_size=tt_size, move_ordering=move_ordering, batch_eval=batch_eval,
+               chance_nodes=chance_nodes, star2=star2, incremental_eval=incremental_eval, eval_debug=eval_debug))
+    self._shared_alpha = None
+    # con n_samples > 1 si cercano n_samples stime diverse delle mosse nascoste dell'avversario
+    # e si combinano i valori delle azioni della radice: 'average' (media) o 'vote' (azione migliore
+    # di ogni campione); con sample_workers > 1 i campioni vengono cercati da un pool di processi
+    self.n_samples = n_samples
+    self.combine = combine
+    self.sampler: SampleSearcher = None
+    if n_samples > 1 and sample_workers > 1:
+      self.sampler = SampleSearcher(sample_workers,
+          dict(max_depth=max_depth, seed=seed, tt_size=tt_size, move_ordering=move_ordering, batch_eval=batch_eval,
+               chance_nodes=chance_nodes, star2=star2, incremental_eval=incremental_eval, eval_debug=eval_debug))
+    self._sample_stats: dict = None
 
   def get_action(self, g: GameState) -> int:
+    if self.n_samples > 1:
+      return self._determinized_action(g)
     root: Node = Node()
-    root.gameState = g
 
     #print('---------------------------------')
     # print('OPPONENT MOVES')
@@ -130,11 +180,48 @@ class AlphaBetaPolicy(BattlePolicy):
     # print(g.teams[1])
     # print('---------------------------------')
     
-    # stimo delle mosse dell'avversario che non conosco
-    estimate_move(root.gameState.teams[1].active)
+    # unica copia dello stato: la ricerca applica e annulla le azioni in place
+    self._search = SearchState(g)
+    root.gameState = self._search.root
+    # stimo delle mosse dell'avversario che non conosco, solo sulla copia
+    self.belief.observe(g)
+    self.belief.fill(root.gameState.teams[1].active, self.rng)
+    self._init_root(root)
     action = self._alphaBeta_search(root)
     return action
 
+  def _init_root(self, root: Node) -> None:
+    self._reset_counters()
+    if self.orderer is not None:
+      self.orderer.new_turn()
+    if self.tt is not None:
+      self.tt.new_turn()
+      root.features = state_features(root.gameState)
+      root.key = self.hasher.hash(root.features)
+    if self.evaluator is not None:
+      self.evaluator.new_search()
+      root.terms = self.evaluator.terms(root.gameState)
+    if self.chance_nodes:
+      self._bounds = EvalBounds(root.gameState)
+
+  def _reset_counters(self) -> None:
+    self.n_nodes = 0
+    self.n_leaves = 0
+    self.n_cutoffs = 0
+    self.max_ply = 0
+
+  def search_stats(self) -> dict:
+    # lavoro fatto dall'ultima get_action (vedi bots/Profiling.py)
+    if self.n_samples > 1 and self._sample_stats is not None:
+      return dict(self._sample_stats)
+    return self._search_counters()
+
+  def _search_counters(self) -> dict:
+    search = self._search
+    return dict(nodes=self.n_nodes, leaves=self.n_leaves, cutoffs=self.n_cutoffs, depth=self.max_ply,
+                copies=search.n_copies if search is not None else 0,
+                steps=search.n_steps if search is not None else 0)
+
   def _alphaBeta_search(
       self,
       root: Node,
@@ -142,33 +229,222 @@ class AlphaBetaPolicy(BattlePolicy):
       beta: float = np.inf
   ) -> int:
     #print("ALPHA BETA SEARCH")
-    value, move = self._max_value(root, alpha, beta)
+    root.on_pv = True
+    self._pv = []
+    self._pv_table = {}
+    self._deadline = None
+    self._replay_replies = self.time_budget is None
+    if self.time_budget is None:
+      self._depth_limit = self.max_depth
+      value, move = self._root_value(root, alpha, beta)
+      self.completed_depth = self.max_depth
+      return move
+    # iterative deepening: ogni iterazione aggiunge un turno (una mossa per giocatore)
+    # e parte dalla variante principale di quella precedente
+    start = time.perf_counter()
+    move = None
+    self.completed_depth = 0
+    for depth in deepening_depths(self.max_depth):
+      self._depth_limit = depth
+      self._pv_table = {}
+      try:
+        value, iteration_move = self._root_value(root, alpha, beta)
+      except SearchTimeout:
+        break
+      move = iteration_move
+      self.completed_depth = depth
+      self._pv = self._pv_table.get(0, [])
+      # la prima iterazione viene sempre completata, le successive no
+      self._deadline = start + self.time_budget
+      if time.perf_counter() >= self._deadline:
+        break
     #print('---------------------------------')
     #print(f'AlphaBetaPolicy chose action: {root.gameState.teams[0].active.moves[move]}, with value: {value}')
     #print('---------------------------------')
     return move
 
+  def _determinized_action(self, g: GameState) -> int:
+    states = self.belief.samples(g, self.n_samples, self.rng)
+    if self.sampler is not None and self.sampler.available():
+      values, stats = self.sampler.search(self, states)
+    else:
+      values, stats = [], []
+      # in serie il tempo a disposizione viene diviso tra i campioni
+      time_budget = None if self.time_budget is None else self.time_budget / len(states)
+      for state in states:
+        values.append(self._sample_values(state, time_budget))
+        stats.append(self._search_counters())
+    self._sample_stats = {key: sum(s[key] for s in stats) for key in stats[0]}
+    self._sample_stats['depth'] = max(s['depth'] for s in stats)
+    # più le copie dei campioni
+    self._sample_stats['copies'] += len(states)
+    actions = range(DEFAULT_N_ACTIONS)
+    average = [sum(v[i] for v in values) / len(values) for i in actions]
+    if self.combine == 'vote':
+      votes = [0] * DEFAULT_N_ACTIONS
+      for v in values:
+        votes[max(actions, key=lambda i: v[i])] += 1
+      # a parità di voti decide la media
+      return max(actions, key=lambda i: (votes[i], average[i]))
+    return max(actions, key=lambda i: average[i])
+
+  def _sample_values(self, g: GameState, time_budget: float = None) -> List[float]:
+    # valori delle azioni della radice per uno stato già determinizzato, con lo stesso
+    # approfondimento iterativo di _alphaBeta_search quando c'è time_budget
+    root: Node = Node()
+    self._search = SearchState(g)
+    root.gameState = self._search.root
+    self._init_root(root)
+    self._pv = []
+    self._pv_table = {}
+    self._deadline = None
+    self._replay_replies = time_budget is None
+    if time_budget is None:
+      self._depth_limit = self.max_depth
+      values = self._action_values(root)
+      self.completed_depth = self.max_depth
+      return values
+    start = time.perf_counter()
+    values = None
+    self.completed_depth = 0
+    for depth in deepening_depths(self.max_depth):
+      self._depth_limit = depth
+      self._pv_table = {}
+      try:
+        iteration_values = self._action_values(root)
+      except SearchTimeout:
+        break
+      values = iteration_values
+      self.completed_depth = depth
+      self._pv = self._pv_table.get(0, [])
+      self._deadline = start + time_budget
+      if time.perf_counter() >= self._deadline:
+        break
+    return values
+
+  def _action_values(self, root: Node) -> List[float]:
+    # valore esatto (finestra piena) di ogni azione della radice, per poter combinare i campioni
+    values = [-np.inf] * DEFAULT_N_ACTIONS
+    best = -np.inf
+    for i in self._order(root, list(range(DEFAULT_N_ACTIONS)), 0):
+      child: Node = Node()
+      child.depth = 1
+      child.action = i
+      child.gameState = root.gameState
+      child.features = root.features
+      child.key = root.key
+      child.terms = root.terms
+      child.on_pv = self._child_on_pv(root, i)
+      values[i], _ = self._min_value(child, -np.inf, np.inf)
+      if values[i] > best:
+        best = values[i]
+        self._pv_table[0] = [i] + self._pv_table.get(1, [])
+    return values
+
+  def _root_value(self, root: Node, alpha: float, beta: float) -> tuple[float, Union[int, None]]:
+    state = root.gameState
+    if (self.splitter is not None and self.splitter.available(self._depth_limit)
+        and state.teams[0].active.hp > 0 and state.teams[1].active.hp > 0):
+      return self.splitter.search(self, root, alpha, beta)
+    return self._max_value(root, alpha, beta)
+
+  def reseed(self, seed: int) -> None:
+    # inizio di una nuova battaglia: nuovo flusso casuale e nessuna informazione dalle precedenti,
+    # così la battaglia si può rigiocare da sola con lo stesso risultato
+    self.rng = random.Random(seed)
+    self.belief = OpponentBelief()
+    if self.tt is not None:
+      self.tt.clear()
+    if self.orderer is not None:
+      self.orderer = MoveOrderer()
+
+  def close(self):
+    if self.splitter is not None:
+      self.splitter.close()
+    if self.sampler is not None:
+      self.sampler.close()
+
+  def _order(self, node: Node, actions: List[int], side: int) -> List[int]:
+    if self.orderer is not None:
+      actions = self.orderer.order(node.gameState, node.depth, side, actions)
+    # la mossa della variante principale dell'iterazione precedente viene provata per prima
+    if node.on_pv and node.depth < len(self._pv):
+      actions.remove(self._pv[node.depth])
+      actions.insert(0, self._pv[node.depth])
+    return actions
+
+  def _cutoff(self, node: Node, action: int, side: int) -> None:
+    self.n_cutoffs += 1
+    if self.orderer is not None:
+      self.orderer.cutoff(node.depth, side, action, self._depth_limit - node.depth)
+
+  def _child_on_pv(self, node: Node, action: int) -> bool:
+    return node.on_pv and node.depth < len(self._pv) and self._pv[node.depth] == action
+
   def _max_value(
       self,
       node: Node,
       alpha: float,
-      beta: float
+      beta: float,
+      first_only: bool = False
   ) -> tuple[float, Union[int, None]]:
-    state: GameState = deepcopy(node.gameState)
+    state: GameState = node.gameState
     # print('---------------------------------')
     # print(f'CURRENT NODE: {str(node)}')
     # print('---------------------------------')
     # print(f'MY HP: {state.teams[1].active.hp}')
     # print(f'OPPONENT HP: {state.teams[1].active.hp}')
-    if state.teams[1].active.hp == 0 or state.teams[0].active.hp == 0 or node.depth >= self.max_depth:
+    if self._deadline is not None and time.perf_counter() > self._deadline:
+      raise SearchTimeout()
+    self._pv_table[node.depth] = []
+    self.n_nodes += 1
+    if state.teams[1].active.hp == 0 or state.teams[0].active.hp == 0 or node.depth >= self._depth_limit:
+      self.n_leaves += 1
+      if node.depth > self.max_ply:
+        self.max_ply = node.depth
+      if self.evaluator is not None:
+        return self.evaluator.value(node.terms, node.depth, state), None
       return game_state_eval(state, node.depth), None
+    actions = self._order(node, list(range(DEFAULT_N_ACTIONS)), 0)
+    if self.tt is not None:
+      # i valori sono salvati al netto della penalità di profondità di game_state_eval,
+      # così restano validi a profondità (pari) diverse e nei turni successivi
+      offset = 0.3*math.ceil(node.depth/2)
+      remaining = self._depth_limit - node.depth
+      entry = self.tt.probe(node.key)
+      if entry is not None:
+        if entry.depth >= remaining:
+          tt_value = entry.value - offset
+          if entry.bound == EXACT:
+            self._pv_table[node.depth] = [entry.move]
+            return tt_value, entry.move
+          elif entry.bound == LOWER:
+            alpha = max(alpha, tt_value)
+          else:
+            beta = min(beta, tt_value)
+          if alpha >= beta:
+            return tt_value, entry.move
+        # la mossa migliore trovata in precedenza viene provata per prima
+        if entry.move is not None:
+          actions.remove(entry.move)
+          actions.insert(0, entry.move)
+    if first_only:
+      # sondaggio Star2: basta la prima azione per avere un limite inferiore
+      actions = actions[:1]
+    if self._shared_alpha is not None:
+      # la finestra cercata parte dall'alpha condiviso della radice
+      alpha = max(alpha, self._shared_alpha.value)
+    alpha_orig = alpha
     value = -np.inf
-    for i in range(DEFAULT_N_ACTIONS):
+    for i in actions:
       next_node: Node = Node()
-      next_node.parent = node
       next_node.depth = node.depth + 1
       next_node.action = i
       next_node.gameState = state
+      next_node.features = node.features
+      next_node.key = node.key
+      next_node.terms = node.terms
+      next_node.on_pv = self._child_on_pv(node, i)
       next_node.value, _ = self._min_value(next_node, alpha, beta)
       # print('---------------------------------')
       # print(f'NEXT NODE: {str(next_node)}')
@@ -176,8 +452,22 @@ class AlphaBetaPolicy(BattlePolicy):
       if next_node.value > value:
         value, move = next_node.value, next_node.action
         alpha = max(value, alpha)
+        self._pv_table[node.depth] = [i] + self._pv_table.get(node.depth+1, [])
       if value >= beta:
-        return value, move
+        self._cutoff(node, i, 0)
+        break
+    if self.tt is not None and not first_only:
+      if self._shared_alpha is not None:
+        # i nodi min sotto questo hanno potato con l'alpha condiviso, che può essere salito
+        # durante la visita: un valore sotto di esso è solo un limite superiore
+        alpha_orig = max(alpha_orig, self._shared_alpha.value)
+      if value <= alpha_orig:
+        bound = UPPER
+      elif value >= beta:
+        bound = LOWER
+      else:
+        bound = EXACT
+      self.tt.store(node.key, value + offset, remaining, bound, move)
     return value, move
         
   def _min_value(
@@ -186,19 +476,167 @@ class AlphaBetaPolicy(BattlePolicy):
       alpha: float,
       beta: float
   ) -> tuple[float, Union[int, None]]:
-    state: GameState = deepcopy(node.gameState)
+    if (self.leaves is not None and node.depth + 1 >= self._depth_limit and not self.chance_nodes
+        and alpha == -np.inf and self._shared_alpha is None):
+      return self._min_value_frontier(node, alpha, beta)
+    if self._replay_replies and not self.chance_nodes:
+      return self._min_value_replayed(node, alpha, beta)
+    self._pv_table[node.depth] = []
+    self.n_nodes += 1
+    value = np.inf
+    for i in self._order(node, list(range(DEFAULT_N_ACTIONS)), 1):
+      # ogni risposta dell'avversario parte dallo stesso stato, ripristinato dopo la visita,
+      # così l'ordine delle risposte non cambia le posizioni valutate
+      if self._shared_alpha is not None:
+        # alpha condiviso della radice, aggiornato dagli altri worker
+        alpha = max(alpha, self._shared_alpha.value)
+      if self.chance_nodes:
+        next_value = self._chance_value(node, i, alpha, beta)
+      else:
+        next_value = self._outcome_value(node, i, (), alpha, beta)
+      if next_value < value:
+        value, move = next_value, i
+        beta = min(value, beta)
+        self._pv_table[node.depth] = [i] + self._pv_table.get(node.depth+1, [])
+      if value <= alpha:
+        self._cutoff(node, i, 1)
+        break
+    return value, move
+
+  def _min_value_replayed(
+      self,
+      node: Node,
+      alpha: float,
+      beta: float
+  ) -> tuple[float, Union[int, None]]:
+    # ricerca a profondità fissa: le risposte in ordine 0..5, ognuna applicata sullo stato lasciato
+    # dalla precedente, e lo stato del nodo ripristinato all'uscita; hash e termini della
+    # valutazione seguono la catena degli step
+    state: GameState = node.gameState
+    self._pv_table[node.depth] = []
+    self.n_nodes += 1
+    self._search.push(state)
+    features, key, terms = node.features, node.key, node.terms
     value = np.inf
     for i in range(DEFAULT_N_ACTIONS):
-      next_state, _, _, _, _ = state.step([node.action, i])
+      if self._shared_alpha is not None:
+        alpha = max(alpha, self._shared_alpha.value)
       next_node: Node = Node()
-      next_node.parent = node
       next_node.depth = node.depth + 1
       next_node.action = i
-      next_node.gameState = next_state[0]
-      next_node.value, _ = self._max_value(next_node, alpha, beta)
-      if next_node.value < value:
-        value, move = next_node.value, next_node.action
+      stage_changed = self.evaluator is not None and self.evaluator.stage_changing(state, [node.action, i])
+      actives = step_actives(state) if self.tt is not None else None
+      next_node.gameState = self._search.step(state, [node.action, i])
+      if self.evaluator is not None:
+        next_node.terms = terms = self.evaluator.update(terms, next_node.gameState, stage_changed)
+      if self.tt is not None:
+        parts = changed_parts(next_node.gameState, actives)
+        next_node.features = update_features(features, next_node.gameState, parts)
+        next_node.key = self.hasher.update(key, features, next_node.features, parts)
+        features, key = next_node.features, next_node.key
+      next_value, _ = self._max_value(next_node, alpha, beta)
+      if next_value < value:
+        value, move = next_value, i
         beta = min(value, beta)
+        self._pv_table[node.depth] = [i] + self._pv_table.get(node.depth+1, [])
       if value <= alpha:
-        return value, move
+        self._cutoff(node, i, 1)
+        break
+    self._search.pop()
+    return value, move
+
+  def _outcome_value(self, node: Node, i: int, forced: tuple, alpha: float, beta: float,
+      first_only: bool = False) -> float:
+    # applica la coppia di azioni (con l'esito imposto, se c'è) e cerca il nodo max che segue
+    state: GameState = node.gameState
+    self._search.push(state)
+    next_node: Node = Node()
+    next_node.depth = node.depth + 1
+    next_node.action = i
+    saved = force_outcome(forced)
+    stage_changed = self.evaluator is not None and self.evaluator.stage_changing(state, [node.action, i])
+    actives = step_actives(state) if self.tt is not None else None
+    next_node.gameState = self._search.step(state, [node.action, i])
+    restore_outcome(saved)
+    if self.evaluator is not None:
+      next_node.terms = self.evaluator.update(node.terms, next_node.gameState, stage_changed)
+    next_node.on_pv = self._child_on_pv(node, i)
+    if self.tt is not None:
+      # hash incrementale: solo le parti che lo step può cambiare vengono ricalcolate
+      parts = changed_parts(next_node.gameState, actives)
+      next_node.features = update_features(node.features, next_node.gameState, parts)
+      next_node.key = self.hasher.update(node.key, node.features, next_node.features, parts)
+    value, _ = self._max_value(next_node, alpha, beta, first_only)
+    self._search.pop()
+    return value
+
+  def _chance_value(self, node: Node, i: int, alpha: float, beta: float) -> float:
+    # valore atteso sugli esiti della coppia di azioni (*-minimax): restituisce il valore esatto
+    # se cade nella finestra, altrimenti un limite (superiore se <= alpha, inferiore se >= beta)
+    outcomes = joint_outcomes(node.gameState, [node.action, i])
+    if len(outcomes) == 1:
+      return self._outcome_value(node, i, outcomes[0][1], alpha, beta)
+    probs = [p for p, _ in outcomes]
+    eval_lower, eval_upper = self._bounds.bounds(node.gameState, node.depth, self._depth_limit)
+    lower = [eval_lower] * len(outcomes)
+    upper = [eval_upper] * len(outcomes)
+    if self.star2:
+      # Star2: la prima azione del nodo max di ogni esito dà un limite inferiore del suo valore
+      for k, (p, forced) in enumerate(outcomes):
+        rest = sum(probs[j]*lower[j] for j in range(len(outcomes)) if j != k)
+        probe_beta = (beta - rest) / p
+        lower[k] = max(lower[k], self._outcome_value(node, i, forced, -np.inf, probe_beta, first_only=True))
+        if lower[k] >= probe_beta:
+          return rest + p*lower[k]
+    # Star1: finestra di ogni esito ricavata da alpha, beta e dai limiti degli esiti non ancora cercati
+    total = 0.
+    for k, (p, forced) in enumerate(outcomes):
+      rest_lower = sum(probs[j]*lower[j] for j in range(k+1, len(outcomes)))
+      rest_upper = sum(probs[j]*upper[j] for j in range(k+1, len(outcomes)))
+      child_alpha = (alpha - total - rest_upper) / p
+      child_beta = (beta - total - rest_lower) / p
+      value = self._outcome_value(node, i, forced, max(child_alpha, lower[k]), min(child_beta, upper[k]))
+      total += p*value
+      if value <= child_alpha:
+        return total + rest_upper
+      if value >= child_beta:
+        return total + rest_lower
+    return total
+
+  def _min_value_frontier(
+      self,
+      node: Node,
+      alpha: float,
+      beta: float
+  ) -> tuple[float, Union[int, None]]:
+    # tutti i figli sono foglie e con alpha = -inf nessuna risposta può essere tagliata: si applicano
+    # tutte (gli stessi step, nello stesso ordine, di _min_value) e si valutano in blocco. Dove un
+    # taglio è possibile si usa _min_value, per non fare step che la potatura avrebbe evitato
+    if self._deadline is not None and time.perf_counter() > self._deadline:
+      raise SearchTimeout()
+    state: GameState = node.gameState
+    self._pv_table[node.depth] = []
+    self.n_nodes += 1
+    if self._replay_replies:
+      # come _min_value_replayed: risposte in sequenza sullo stesso stato
+      actions = list(range(DEFAULT_N_ACTIONS))
+      self._search.push(state)
+      for i in actions:
+        self.leaves.add(self._search.step(state, [node.action, i]), node.depth + 1)
+      self._search.pop()
+    else:
+      actions = self._order(node, list(range(DEFAULT_N_ACTIONS)), 1)
+      for i in actions:
+        self._search.push(state)
+        self.leaves.add(self._search.step(state, [node.action, i]), node.depth + 1)
+        self._search.pop()
+    self.n_nodes += len(actions)
+    self.n_leaves += len(actions)
+    if node.depth + 1 > self.max_ply:
+      self.max_ply = node.depth + 1
+    value = np.inf
+    for i, leaf_value in zip(actions, self.leaves.flush()):
+      if leaf_value < value:
+        value, move = float(leaf_value), i
+        self._pv_table[node.depth] = [i]
     return value, move
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmStatus
+from vgc.datatypes.Objects import GameState
+
+from bots.AlphaBetaPolicy import game_state_eval, status_eval
+from bots.PkmTables import TYPE_CHART
+
+# status_eval viene applicata a ogni stato possibile, così la tabella coincide con la funzione scalare
+STATUS_SCORE = np.zeros(max(int(s) for s in PkmStatus) + 1)
+for _status in PkmStatus:
+  STATUS_SCORE[int(_status)] = status_eval(SimpleNamespace(status=_status))
+
+N_MOVES = 4
+# colonne di una riga impacchettata
+MY_TYPE, OPP_TYPE = 0, 1
+MY_MOVES = slice(2, 2+N_MOVES)
+OPP_MOVES = slice(2+N_MOVES, 2+2*N_MOVES)
+MY_HP, OPP_HP, PARTY_HP, MY_STAGE, OPP_STAGE, MY_STATUS, OPP_STATUS, DEPTH = range(2+2*N_MOVES, 10+2*N_MOVES)
+ROW_SIZE = 10+2*N_MOVES
+
+def pack_state(g: GameState, depth: int) -> List[float]:
+  # legge dallo stato solo i numeri usati da game_state_eval (le mosse avversarie
+  # non ancora note hanno tipo -1)
+  my_team = g.teams[0]
+  opp_team = g.teams[1]
+  my_active = my_team.active
+  opp_active = opp_team.active
+  return ([int(my_active.type), int(opp_active.type)]
+          + [int(move.type) for move in my_active.moves]
+          + [int(move.type) if move.name is not None else -1 for move in opp_active.moves]
+          + [my_active.hp/my_active.max_hp,
+             opp_active.hp/opp_active.max_hp,
+             my_team.party[0].hp/my_team.party[0].max_hp + my_team.party[1].hp/my_team.party[1].max_hp,
+             sum(my_team.stage),
+             sum(opp_team.stage),
+             int(my_active.status),
+             int(opp_active.status),
+             depth])
+
+def batch_eval(rows: np.ndarray) -> np.ndarray:
+  # valuta tutte le foglie impacchettate in un colpo solo, con la stessa formula di game_state_eval
+  my_type = rows[:, MY_TYPE].astype(np.intp)[:, None]
+  opp_type = rows[:, OPP_TYPE].astype(np.intp)[:, None]
+  my_moves = rows[:, MY_MOVES].astype(np.intp)
+  opp_moves = rows[:, OPP_MOVES].astype(np.intp)
+  known = opp_moves >= 0
+  opp_moves_safe = np.where(known, opp_moves, 0)
+  # match up difensivo: le mosse note dell'avversario contro il nostro tipo
+  defensive = TYPE_CHART[opp_moves_safe, my_type] * np.where(opp_moves == opp_type, 1.5, 1.)
+  defensive = np.where(known, defensive, 0.).max(axis=1)
+  # match up offensivo, identico a match_up_eval (anche nel caso di mossa non stab)
+  offensive = np.where(my_moves == opp_type, TYPE_CHART[my_moves, opp_type]*1.5, TYPE_CHART[my_moves, my_type])
+  offensive = np.maximum(offensive.max(axis=1), 0.)
+  status = STATUS_SCORE[rows[:, MY_STATUS].astype(np.intp)] - STATUS_SCORE[rows[:, OPP_STATUS].astype(np.intp)]
+  return (offensive - defensive
+          + rows[:, MY_HP]*3
+          - rows[:, OPP_HP]*3
+          + 0.2*rows[:, MY_STAGE]
+          - 0.2*rows[:, OPP_STAGE]
+          + status
+          - 0.3*np.ceil(rows[:, DEPTH]/2)
+          + rows[:, PARTY_HP]*2)
+
+class LeafBuffer():
+  # raccoglie le foglie di un sottoalbero durante la ricerca e le valuta insieme
+
+  def __init__(self):
+    self.rows: List[List[float]] = []
+
+  def add(self, g: GameState, depth: int) -> None:
+    self.rows.append(pack_state(g, depth))
+
+  def __len__(self) -> int:
+    return len(self.rows)
+
+  def flush(self) -> np.ndarray:
+    values = batch_eval(np.array(self.rows, dtype=np.float64).reshape(-1, ROW_SIZE))
+    self.rows = []
+    return values
+
+def check_batch_eval(states: List[GameState], depths: List[int], atol: float = 1e-9) -> float:
+  # confronta il valutatore vettoriale con game_state_eval e restituisce la differenza massima
+  rows = np.array([pack_state(g, d) for g, d in zip(states, depths)], dtype=np.float64).reshape(-1, ROW_SIZE)
+  expected = np.array([game_state_eval(g, d) for g, d in zip(states, depths)])
+  error = float(np.max(np.abs(batch_eval(rows) - expected))) if len(states) > 0 else 0.
+  assert error <= atol, f'batch_eval differs from game_state_eval by {error}'
+  return error
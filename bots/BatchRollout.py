@@ -0,0 +1,220 @@
+from copy import deepcopy
+from typing import Callable, List
+
+import time
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmStat
+from vgc.datatypes.Objects import GameState
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.PkmTables import TYPE_CHART, WEATHER_RATE, STAB
+
+# Rollout vettoriali: molte battaglie semplificate avanzano insieme come array numpy.
+# Per ogni battaglia b, lato s e posizione p (0 l'attivo iniziale, 1-2 il party):
+# hp[b,s,p], pp[b,s,p,m], order[b,s,:] (order[b,s,0] è l'attivo, come team.active/party
+# dopo i cambi), stage[b,s,stat] e il meteo. Il danno è quello di calculate_damage;
+# non sono modellati status, confusione, cambi di stage e di meteo durante il rollout,
+# né i danni da entry hazard.
+
+N_MOVES = DEFAULT_N_ACTIONS - 2
+N_PKM = 3
+WEATHER_CHART = np.array(WEATHER_RATE, dtype=np.float64)
+
+def stage_rate(stage_level: np.ndarray) -> np.ndarray:
+  return np.where(stage_level >= 0, (stage_level + 2.) / 2, 2. / (np.abs(stage_level) + 2.))
+
+class RolloutBatch():
+
+  def __init__(self, n: int):
+    self.n = n
+    self.hp = np.zeros((n, 2, N_PKM))
+    self.max_hp = np.ones((n, 2, N_PKM))
+    self.pkm_type = np.zeros((n, 2, N_PKM), dtype=np.intp)
+    self.move_type = np.zeros((n, 2, N_PKM, N_MOVES), dtype=np.intp)
+    self.power = np.zeros((n, 2, N_PKM, N_MOVES))
+    self.acc = np.ones((n, 2, N_PKM, N_MOVES))
+    self.fixed_damage = np.zeros((n, 2, N_PKM, N_MOVES))
+    self.priority = np.zeros((n, 2, N_PKM, N_MOVES), dtype=bool)
+    self.pp = np.zeros((n, 2, N_PKM, N_MOVES))
+    self.order = np.tile(np.arange(N_PKM), (n, 2, 1))
+    self.stage = np.zeros((n, 2, len(PkmStat)))
+    self.weather = np.zeros(n, dtype=np.intp)
+
+  @classmethod
+  def from_states(cls, states: List[GameState]) -> 'RolloutBatch':
+    batch = cls(len(states))
+    for b, g in enumerate(states):
+      batch.weather[b] = int(g.weather.condition)
+      for s, team in enumerate(g.teams):
+        batch.stage[b, s] = team.stage
+        for p, pkm in enumerate([team.active] + list(team.party)):
+          batch.hp[b, s, p] = pkm.hp
+          batch.max_hp[b, s, p] = pkm.max_hp
+          batch.pkm_type[b, s, p] = int(pkm.type)
+          for m, move in enumerate(pkm.moves):
+            # una mossa sconosciuta (name None) non fa danni
+            if move.name is None:
+              continue
+            batch.move_type[b, s, p, m] = int(move.type)
+            batch.power[b, s, p, m] = move.power
+            batch.acc[b, s, p, m] = move.acc
+            batch.fixed_damage[b, s, p, m] = move.fixed_damage
+            batch.priority[b, s, p, m] = move.priority
+            batch.pp[b, s, p, m] = move.pp
+    return batch
+
+  @classmethod
+  def repeat(cls, g: GameState, n: int) -> 'RolloutBatch':
+    # n copie della stessa posizione, per stimarne il valore con n rollout
+    single = cls.from_states([g])
+    batch = cls(n)
+    for name, value in single.__dict__.items():
+      if isinstance(value, np.ndarray):
+        setattr(batch, name, np.repeat(value, n, axis=0))
+    return batch
+
+  def active(self) -> np.ndarray:
+    return self.order[:, :, 0]
+
+  def alive(self) -> np.ndarray:
+    return self.hp > 0
+
+  def done(self) -> np.ndarray:
+    # battaglia finita quando uno dei due lati non ha più pokemon vivi
+    return ~self.alive().any(axis=2).all(axis=1)
+
+  def damage(self, attacker: int, move: np.ndarray) -> np.ndarray:
+    # danno della mossa move dell'attivo di attacker sull'attivo avversario, come calculate_damage
+    b = np.arange(self.n)
+    defender = 1 - attacker
+    att = self.active()[:, attacker]
+    dfn = self.active()[:, defender]
+    move_type = self.move_type[b, attacker, att, move]
+    type_rate = TYPE_CHART[move_type, self.pkm_type[b, defender, dfn]]
+    stab = np.where(move_type == self.pkm_type[b, attacker, att], STAB, 1.)
+    stage = stage_rate(self.stage[:, attacker, PkmStat.ATTACK] - self.stage[:, defender, PkmStat.DEFENSE])
+    damage = type_rate * stab * WEATHER_CHART[self.weather, move_type] * stage * self.power[b, attacker, att, move]
+    fixed = self.fixed_damage[b, attacker, att, move]
+    damage = np.where(fixed > 0, fixed, damage)
+    damage = np.where(type_rate == 0, 0., damage)
+    return np.where(self.pp[b, attacker, att, move] > 0, damage, 0.)
+
+  def random_actions(self, rng: np.random.Generator) -> np.ndarray:
+    # azioni casuali tra le mosse con pp rimasti; con l'attivo esausto, cambio verso il primo vivo
+    b = np.arange(self.n)[:, None]
+    s = np.arange(2)[None, :]
+    active = self.active()
+    has_pp = self.pp[b, s, active] > 0
+    has_pp[~has_pp.any(axis=2)] = True
+    scores = np.where(has_pp, rng.random(has_pp.shape), -1.)
+    actions = scores.argmax(axis=2)
+    party_alive = self.hp[b[..., None], s[..., None], self.order[:, :, 1:]] > 0
+    forced = (self.hp[b, s, active] <= 0) & party_alive.any(axis=2)
+    return np.where(forced, N_MOVES + party_alive.argmax(axis=2), actions)
+
+  def switch(self, actions: np.ndarray) -> np.ndarray:
+    # applica i cambi e restituisce per ogni battaglia e lato se il cambio è avvenuto
+    b = np.arange(self.n)
+    switched = np.zeros((self.n, 2), dtype=bool)
+    for s in range(2):
+      switch = actions[:, s] >= N_MOVES
+      pos = np.where(switch, actions[:, s] - N_MOVES + 1, 0)
+      target = self.order[b, s, pos]
+      valid = switch & (self.hp[b, s, target] > 0)
+      old = self.order[b, s, 0]
+      self.order[b, s, 0] = np.where(valid, target, old)
+      self.order[b, s, pos] = np.where(valid, old, target)
+      switched[:, s] = valid
+    return switched
+
+  def first_mover(self, actions: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    # chi attacca per primo: priorità, poi velocità, a parità a caso
+    b = np.arange(self.n)
+    move = np.minimum(actions, N_MOVES - 1)
+    attacks = actions < N_MOVES
+    priority = np.stack([self.priority[b, s, self.active()[:, s], move[:, s]] & attacks[:, s] for s in range(2)], axis=1)
+    speed = self.stage[:, :, PkmStat.SPEED]
+    return np.where(priority[:, 0] != priority[:, 1], np.where(priority[:, 0], 0, 1),
+                    np.where(speed[:, 0] != speed[:, 1], np.where(speed[:, 0] > speed[:, 1], 0, 1),
+                             (rng.random(self.n) < .5).astype(np.intp)))
+
+  def step(self, actions: np.ndarray, rng: np.random.Generator) -> None:
+    b = np.arange(self.n)
+    # i cambi avvengono prima delle mosse
+    self.switch(actions)
+    move = np.minimum(actions, N_MOVES - 1)
+    attacks = actions < N_MOVES
+    first = self.first_mover(actions, rng)
+    for turn in range(2):
+      attacker = np.where(turn == 0, first, 1 - first)
+      for s in range(2):
+        acting = (attacker == s) & attacks[:, s]
+        att = self.active()[:, s]
+        acting &= self.hp[b, s, att] > 0
+        damage = self.damage(s, move[:, s])
+        hit = rng.random(self.n) < self.acc[b, s, att, move[:, s]]
+        has_pp = self.pp[b, s, att, move[:, s]] > 0
+        self.pp[b, s, att, move[:, s]] -= acting & has_pp
+        dfn = self.active()[:, 1 - s]
+        hp = self.hp[b, 1 - s, dfn]
+        self.hp[b, 1 - s, dfn] = np.where(acting & hit, np.maximum(0., hp - damage), hp)
+
+  def values(self) -> np.ndarray:
+    # valore per il giocatore 0 in [0, 1]: 1 o 0 a battaglia finita, altrimenti dagli hp rimasti
+    frac = (self.hp / self.max_hp).sum(axis=2) / N_PKM
+    value = .5 + .5 * (frac[:, 0] - frac[:, 1])
+    my_alive = self.alive()[:, 0].any(axis=1)
+    opp_alive = self.alive()[:, 1].any(axis=1)
+    value = np.where(~opp_alive & my_alive, 1., value)
+    return np.where(~my_alive, 0., value)
+
+  def run(self, n_turns: int, rng: np.random.Generator) -> np.ndarray:
+    for _ in range(n_turns):
+      if self.done().all():
+        break
+      self.step(self.random_actions(rng), rng)
+    return self.values()
+
+def rollout_value(g: GameState, n_rollouts: int, n_turns: int, rng: np.random.Generator,
+    leaf_values: Callable[[GameState, 'RolloutBatch'], np.ndarray] = None) -> float:
+  # stima del valore di una foglia: media di n_rollout rollout casuali a partire da g; con
+  # leaf_values gli stati finali vengono valutati con la funzione del chiamante invece che con values()
+  batch = RolloutBatch.repeat(g, n_rollouts)
+  values = batch.run(n_turns, rng)
+  if leaf_values is not None:
+    values = leaf_values(g, batch)
+  return float(values.mean())
+
+def rollouts_per_second(states: List[GameState], n_rollouts: int = 1024, n_turns: int = 10, seed: int = 0) -> float:
+  rng = np.random.default_rng(seed)
+  start = time.perf_counter()
+  for g in states:
+    RolloutBatch.repeat(g, n_rollouts).run(n_turns, rng)
+  return len(states) * n_rollouts / (time.perf_counter() - start)
+
+def check_against_engine(states: List[GameState], n_samples: int = 200, seed: int = 0) -> float:
+  # confronta l'hp atteso dei due attivi dopo un turno (ogni coppia di mosse) tra il motore
+  # vettoriale e GameState.step, e restituisce la differenza massima in frazione di hp.
+  # Il confronto è statistico (precisione, ordine a parità di velocità), quindi la
+  # differenza attesa scende come 1/sqrt(n_samples).
+  rng = np.random.default_rng(seed)
+  error = 0.
+  for g in states:
+    for a0 in range(N_MOVES):
+      for a1 in range(N_MOVES):
+        expected = np.zeros(2)
+        for _ in range(n_samples):
+          state = deepcopy(g)
+          state.step([a0, a1])
+          expected += [state.teams[0].active.hp / state.teams[0].active.max_hp,
+                       state.teams[1].active.hp / state.teams[1].active.max_hp]
+        expected /= n_samples
+        batch = RolloutBatch.repeat(g, n_samples)
+        batch.step(np.tile([a0, a1], (n_samples, 1)), rng)
+        active = batch.active()
+        b = np.arange(n_samples)
+        got = np.array([(batch.hp[b, s, active[:, s]] / batch.max_hp[b, s, active[:, s]]).mean() for s in range(2)])
+        error = max(error, float(np.abs(got - expected).max()))
+  return error
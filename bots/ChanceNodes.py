@@ -0,0 +1,114 @@
+from typing import List, Tuple
+
+import math
+
+from vgc.datatypes.Types import PkmStatus
+from vgc.datatypes.Objects import GameState, PkmMove, PkmTeam
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.PkmTables import match_up_eval
+
+# Nodi di caso per l'expectimax: dopo una coppia di azioni, ogni mossa d'attacco può
+# colpire o mancare (move.acc) e, se colpisce, attivare o no il suo effetto (move.prob).
+# Un esito viene imposto mettendo temporaneamente acc e prob a 1 o 0 prima dello step e
+# rimettendoli subito dopo. Le altre estrazioni del motore (parità di velocità, paralisi,
+# confusione, durata del sonno) restano casuali.
+
+# Limiti di game_state_eval per le foglie sotto a un nodo di caso, usati da Star1/Star2: più sono
+# stretti più finestre vengono tagliate. Si ricavano dai termini della valutazione:
+# - match up: minimo e massimo tra tutte le coppie (nostro pokemon, pokemon avversario), le mosse
+#   non cambiano durante la ricerca
+# - hp: non crescono, salvo per i pokemon di una squadra con mosse di cura (allora fino a 1)
+# - stage: ogni turno la somma di un lato cambia al più di due mosse di stage (una per lato),
+#   e un cambio la riporta a 0
+# - status in [-1, 0] per lato, penalità di profondità tra la profondità del nodo e quella massima
+
+def team_pkms(team: PkmTeam) -> list:
+  return [team.active] + list(team.party)
+
+class EvalBounds():
+
+  def __init__(self, g: GameState):
+    # parte fissa dei limiti, calcolata una volta per ricerca
+    my_pkms, opp_pkms = team_pkms(g.teams[0]), team_pkms(g.teams[1])
+    match_ups = [match_up_eval(my.type, opp.type, [m.type for m in my.moves],
+                               [m.type for m in opp.moves if m.name is not None])
+                 for my in my_pkms for opp in opp_pkms]
+    self.min_match_up = min(match_ups)
+    self.max_match_up = max(match_ups)
+    moves = [move for pkm in my_pkms + opp_pkms for move in pkm.moves]
+    self.max_stage_delta = max([abs(getattr(move, 'stage', 0)) for move in moves], default=0)
+    self.heals = [any(getattr(move, 'recover', 0.) > 0 for pkm in pkms for move in pkm.moves)
+                  for pkms in (my_pkms, opp_pkms)]
+
+  def _hp(self, team: PkmTeam, side: int) -> List[float]:
+    if self.heals[side]:
+      return [1., 1., 1.]
+    return sorted(pkm.hp/pkm.max_hp for pkm in team_pkms(team))
+
+  def bounds(self, g: GameState, depth: int, depth_limit: int) -> Tuple[float, float]:
+    # limiti del valore delle foglie sotto al nodo min a profondità depth (turno compreso)
+    my_team, opp_team = g.teams
+    my_hp, opp_hp = self._hp(my_team, 0), self._hp(opp_team, 1)
+    turns = 1 + max(0, math.ceil((depth_limit - depth - 1) / 2))
+    stage_delta = 2 * turns * self.max_stage_delta
+    my_stage, opp_stage = sum(my_team.stage), sum(opp_team.stage)
+    upper = (self.max_match_up + 3*my_hp[-1]
+             + 0.2*(max(my_stage, 0) + stage_delta) - 0.2*(min(opp_stage, 0) - stage_delta)
+             + 1. - 0.3*math.ceil((depth + 1)/2) + 2*(my_hp[-1] + my_hp[-2]))
+    lower = (self.min_match_up - 3*opp_hp[-1]
+             + 0.2*(min(my_stage, 0) - stage_delta) - 0.2*(max(opp_stage, 0) + stage_delta)
+             - 1. - 0.3*math.ceil(depth_limit/2))
+    return lower, upper
+
+def has_effect(move: PkmMove) -> bool:
+  return move.status != PkmStatus.NONE or getattr(move, 'stage', 0) != 0
+
+def move_outcomes(move: PkmMove) -> List[Tuple[float, float, float]]:
+  # esiti di una mossa come (probabilità, acc imposta, prob imposta); None lascia il valore
+  acc = min(max(move.acc, 0.), 1.)
+  outcomes = []
+  if acc > 0.:
+    prob = min(max(move.prob, 0.), 1.)
+    if has_effect(move) and 0. < prob < 1.:
+      outcomes.append((acc*prob, 1., 1.))
+      outcomes.append((acc*(1.-prob), 1., 0.))
+    else:
+      outcomes.append((acc, 1., None))
+  if acc < 1.:
+    outcomes.append((1.-acc, 0., None))
+  return outcomes
+
+def joint_outcomes(g: GameState, actions: List[int]) -> List[Tuple[float, tuple]]:
+  # prodotto degli esiti delle mosse dei due attivi; ogni esito è (probabilità, imposizioni)
+  # con le imposizioni come tuple (mossa, acc, prob)
+  per_side = []
+  seen = []
+  for side, action in enumerate(actions):
+    pkm = g.teams[side].active
+    if action >= DEFAULT_N_ACTIONS-2 or pkm.hp <= 0:
+      continue
+    move = pkm.moves[action]
+    # la stessa mossa condivisa dai due lati non si può imporre in due modi diversi
+    if move.pp <= 0 or move.name is None or any(move is m for m in seen):
+      continue
+    seen.append(move)
+    per_side.append([(p, (move, acc, prob)) for p, acc, prob in move_outcomes(move)])
+  outcomes = [(1., ())]
+  for side in per_side:
+    outcomes = [(p*q, forced + (force,)) for p, forced in outcomes for q, force in side if p*q > 0.]
+  return outcomes
+
+def force_outcome(forced: tuple) -> list:
+  saved = []
+  for move, acc, prob in forced:
+    saved.append((move, move.acc, move.prob))
+    move.acc = acc
+    if prob is not None:
+      move.prob = prob
+  return saved
+
+def restore_outcome(saved: list) -> None:
+  for move, acc, prob in saved:
+    move.acc = acc
+    move.prob = prob
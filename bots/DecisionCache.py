@@ -0,0 +1,162 @@
+from typing import Union
+
+import hashlib
+import os
+import sqlite3
+import time
+
+from vgc.behaviour import BattlePolicy
+from vgc.datatypes.Objects import GameState, Pkm, PkmTeam
+
+# Cache persistente delle decisioni di inizio battaglia. Le prime get_action di una
+# battaglia (squadre complete, poche mosse avversarie note) sono le più costose e si
+# ripetono identiche ogni volta che un accoppiamento viene rigiocato con gli stessi team.
+# La chiave è un hash canonico dello stato e del nome della policy; le decisioni stanno in
+# un file sqlite condiviso dai processi di un torneo e tra un torneo e l'altro, con
+# rimozione delle voci usate meno di recente oltre max_entries.
+
+def pkm_canonical(pkm: Pkm) -> tuple:
+  return (int(pkm.type), pkm.max_hp, round(pkm.hp), int(pkm.status),
+          tuple((move.name, move.pp) for move in pkm.moves))
+
+def team_canonical(team: PkmTeam) -> tuple:
+  return (tuple(pkm_canonical(pkm) for pkm in [team.active] + list(team.party)),
+          tuple(team.stage), team.confused, tuple(team.entry_hazard))
+
+def decision_key(g: GameState, policy_name: str) -> str:
+  canonical = (policy_name, team_canonical(g.teams[0]), team_canonical(g.teams[1]),
+               int(g.weather.condition), g.weather.n_turns_no_clear)
+  return hashlib.sha1(repr(canonical).encode()).hexdigest()
+
+# opzioni delle policy che cambiano la decisione, incluse nel nome di default di CachedPolicy
+POLICY_OPTIONS = ('max_depth', 'time_budget', 'n_samples', 'combine', 'chance_nodes', 'star2',
+                  'n_iterations', 'rollout_depth', 'max_tree_depth', 'batch_rollouts', 'fast_sim', 'c')
+
+def policy_name(policy: BattlePolicy) -> str:
+  # es. AlphaBetaPolicy(max_depth=4, time_budget=None, n_samples=1, ..., move_ordering=True)
+  options = [f'{option}={getattr(policy, option)!r}' for option in POLICY_OPTIONS if hasattr(policy, option)]
+  if hasattr(policy, 'orderer'):
+    options.append(f'move_ordering={policy.orderer is not None}')
+  if hasattr(policy, 'greedy'):
+    options.append(f'greedy_rollout={policy.greedy is not None}')
+  return f'{type(policy).__name__}({", ".join(options)})'
+
+def early_game(g: GameState, max_revealed: int = 2) -> bool:
+  # inizio battaglia: nessun pokemon esausto e al più max_revealed mosse avversarie note
+  revealed = 0
+  for side, team in enumerate(g.teams):
+    for pkm in [team.active] + list(team.party):
+      if pkm.hp <= 0:
+        return False
+      if side == 1:
+        revealed += sum(move.name is not None for move in pkm.moves)
+  return revealed <= max_revealed
+
+class DecisionCache():
+
+  def __init__(self, path: str = 'decision_cache.sqlite', max_entries: int = 100000):
+    self.path = path
+    self.max_entries = max_entries
+    self._conn: sqlite3.Connection = None
+    self._conn_pid: int = None
+    self._n_puts = 0
+    self.hits = 0
+    self.misses = 0
+
+  def __getstate__(self):
+    # la connessione non passa ai worker: ognuno apre la propria sullo stesso file
+    state = self.__dict__.copy()
+    state['_conn'] = None
+    state['_conn_pid'] = None
+    return state
+
+  def _connection(self) -> sqlite3.Connection:
+    if self._conn is None or self._conn_pid != os.getpid():
+      self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+      self._conn.execute('PRAGMA journal_mode=WAL')
+      self._conn.execute('CREATE TABLE IF NOT EXISTS decisions (key TEXT PRIMARY KEY, action INTEGER, last_used REAL)')
+      self._conn.execute('CREATE INDEX IF NOT EXISTS decisions_last_used ON decisions (last_used)')
+      self._conn_pid = os.getpid()
+    return self._conn
+
+  def get(self, key: str) -> Union[int, None]:
+    conn = self._connection()
+    row = conn.execute('SELECT action FROM decisions WHERE key = ?', (key,)).fetchone()
+    if row is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    conn.execute('UPDATE decisions SET last_used = ? WHERE key = ?', (time.time(), key))
+    return row[0]
+
+  def put(self, key: str, action: int) -> None:
+    conn = self._connection()
+    conn.execute('INSERT OR REPLACE INTO decisions VALUES (?, ?, ?)', (key, action, time.time()))
+    self._n_puts += 1
+    # il conteggio costa una scansione: il limite viene controllato ogni 64 inserimenti
+    if self._n_puts % 64 == 0:
+      self.evict()
+
+  def evict(self) -> None:
+    conn = self._connection()
+    n = conn.execute('SELECT COUNT(*) FROM decisions').fetchone()[0]
+    if n > self.max_entries:
+      # si scende al 90% del limite, così la rimozione non avviene a ogni inserimento
+      conn.execute('DELETE FROM decisions WHERE key IN (SELECT key FROM decisions ORDER BY last_used LIMIT ?)',
+                   (n - int(self.max_entries * .9),))
+
+  def __len__(self) -> int:
+    return self._connection().execute('SELECT COUNT(*) FROM decisions').fetchone()[0]
+
+  def clear(self) -> None:
+    self._connection().execute('DELETE FROM decisions')
+
+  def close(self) -> None:
+    if self._conn is not None:
+      self._conn.close()
+      self._conn = None
+
+class CachedPolicy(BattlePolicy):
+  # avvolge una policy: a inizio battaglia la decisione viene letta dalla cache se c'è,
+  # altrimenti calcolata e salvata; il resto della battaglia passa direttamente alla policy
+
+  def __init__(self, policy: BattlePolicy, cache: DecisionCache, name: str = None, max_revealed: int = 2):
+    self.policy = policy
+    self.cache = cache
+    # il nome distingue le configurazioni: policy con opzioni diverse (profondità, tempo, campioni,
+    # nodi di caso, ...) non condividono le voci
+    self.name = name if name is not None else policy_name(policy)
+    self.max_revealed = max_revealed
+    self.max_depth = getattr(policy, 'max_depth', 0)
+    self._hit = False
+
+  def get_action(self, g: GameState) -> int:
+    self._hit = False
+    if not early_game(g, self.max_revealed):
+      return self.policy.get_action(g)
+    key = decision_key(g, self.name)
+    action = self.cache.get(key)
+    if action is not None:
+      self._hit = True
+      # la policy non viene chiamata: le mosse rivelate in questo turno vanno comunque alla sua credenza
+      if hasattr(self.policy, 'belief'):
+        self.policy.belief.observe(g)
+      return action
+    action = self.policy.get_action(g)
+    if action is not None:
+      self.cache.put(key, action)
+    return action
+
+  def reseed(self, seed: int) -> None:
+    if hasattr(self.policy, 'reseed'):
+      self.policy.reseed(seed)
+
+  def search_stats(self) -> dict:
+    # una decisione presa dalla cache non ha fatto lavoro di ricerca
+    if self._hit or not hasattr(self.policy, 'search_stats'):
+      return dict(nodes=0, leaves=0, cutoffs=0, depth=0, copies=0, steps=0)
+    return self.policy.search_stats()
+
+  def close(self):
+    self.policy.close()
+    self.cache.close()
@@ -0,0 +1,493 @@
+from copy import deepcopy
+from typing import Dict, List
+
+import random
+import time
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmStat, PkmStatus, PkmType, WeatherCondition
+from vgc.datatypes.Objects import GameState, Pkm, PkmMove
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.BatchRollout import RolloutBatch
+from bots.OpponentBelief import OpponentBelief
+from bots.PkmTables import MAX_STAGE_LEVEL, STAB, STAGE_RATE, TYPE_RATE, WEATHER_RATE, stage_rate
+
+# Modello del turno ridotto per la ricerca, su liste semplici invece che sugli oggetti del
+# motore. Copre le regole che le policy usano: cambi (prima delle mosse, azzerano stage e
+# confusione), ordine come canAttackFirst (priorità, poi stage di velocità, a parità a caso),
+# danno come calculate_damage, pp, precisione, effetti con probabilità move.prob (status,
+# confusione, stage, meteo, cura), status che saltano il turno, danni di fine turno da
+# bruciatura/veleno e meteo, durata del meteo. Non sono modellati gli entry hazard.
+# Le costanti sotto non vengono dal motore: differential_test dice quanto spesso il
+# modello e GameState.step danno risultati diversi.
+# SimState è il backend scalare; SimBatch fa avanzare insieme molte battaglie con numpy.
+
+N_MOVES = DEFAULT_N_ACTIONS - 2
+N_PKM = 3
+N_STATS = len(PkmStat)
+# frazione degli hp massimi persa per bruciatura, veleno, meteo e autocolpo in confusione
+STATE_DAMAGE = 1. / 16.
+PARALYSIS_SKIP = .25
+WAKE_PROB = 1. / 3.
+THAW_PROB = .2
+CONFUSION_HIT = 1. / 3.
+MAX_STAGE = 6
+WEATHER_TURNS = 5
+
+# WEATHER_DAMAGE[weather][pkm_type]: 1 se il meteo danneggia il tipo a fine turno
+def _weather_damage(weather: WeatherCondition, pkm_type: PkmType) -> int:
+  if weather == WeatherCondition.SANDSTORM:
+    return int(pkm_type not in (PkmType.ROCK, PkmType.GROUND, PkmType.STEEL))
+  if weather == WeatherCondition.HAIL:
+    return int(pkm_type != PkmType.ICE)
+  return 0
+
+WEATHER_DAMAGE = tuple(tuple(_weather_damage(WeatherCondition(w), PkmType(t)) for t in range(len(PkmType)))
+                       for w in range(len(WeatherCondition)))
+WEATHER_DAMAGE_CHART = np.array(WEATHER_DAMAGE, dtype=np.float64)
+
+# campi di una mossa impacchettata; una mossa sconosciuta (name None) non fa nulla
+M_TYPE, M_POWER, M_ACC, M_PRIORITY, M_FIXED, M_STATUS, M_PROB, M_STAT, M_STAGE, M_TARGET, M_RECOVER, M_WEATHER, M_EFFECT, M_KNOWN = range(14)
+
+def pack_move(move: PkmMove) -> tuple:
+  status = int(move.status)
+  stage = getattr(move, 'stage', 0)
+  weather = int(getattr(move, 'weather', WeatherCondition.CLEAR))
+  effect = status != PkmStatus.NONE or stage != 0 or weather != WeatherCondition.CLEAR
+  return (int(move.type), move.power, move.acc, bool(move.priority), move.fixed_damage, status, move.prob,
+          int(getattr(move, 'stat', PkmStat.ATTACK)), stage, getattr(move, 'target', 1),
+          getattr(move, 'recover', 0.), weather, effect, move.name is not None)
+
+def sim_damage(move: tuple, pkm_type: int, opp_pkm_type: int, attack_stage: int, defense_stage: int, weather: int) -> float:
+  # stessa formula di calculate_damage, sulla mossa impacchettata
+  type_rate = TYPE_RATE[move[M_TYPE]][opp_pkm_type]
+  if type_rate == 0:
+    return 0.
+  if move[M_FIXED] > 0:
+    return move[M_FIXED]
+  stab = STAB if move[M_TYPE] == pkm_type else 1.
+  stage_level = attack_stage - defense_stage
+  if -MAX_STAGE_LEVEL <= stage_level <= MAX_STAGE_LEVEL:
+    stage = STAGE_RATE[stage_level + MAX_STAGE_LEVEL]
+  else:
+    stage = stage_rate(stage_level)
+  return type_rate * stab * WEATHER_RATE[weather][move[M_TYPE]] * stage * move[M_POWER]
+
+def team_members(g: GameState) -> List[List[Pkm]]:
+  return [[team.active] + list(team.party) for team in g.teams]
+
+def pack_moves(g: GameState) -> list:
+  return [[[pack_move(move) for move in pkm.moves] for pkm in pkms] for pkms in team_members(g)]
+
+def pack_moves_by_pkm(g: GameState) -> Dict[int, list]:
+  # mosse impacchettate di ogni pokemon, per identità: restano giuste anche dopo i cambi,
+  # quando l'ordine [attivo] + party non è più quello da cui sono state impacchettate
+  return {id(pkm): [pack_move(move) for move in pkm.moves] for pkms in team_members(g) for pkm in pkms}
+
+def current_moves(g: GameState, packed: Dict[int, list]) -> list:
+  # mosse di packed nell'ordine attuale di g, come pack_moves(g); un pokemon mancante viene impacchettato
+  return [[packed[id(pkm)] if id(pkm) in packed else [pack_move(move) for move in pkm.moves] for pkm in pkms]
+          for pkms in team_members(g)]
+
+class SimState():
+  # indici [lato][pokemon] con i pokemon nell'ordine della squadra all'inizio (attivo, party);
+  # order[lato] dice chi è attivo (order[lato][0]) e l'ordine del party, come dopo i cambi del motore
+  __slots__ = ('hp', 'max_hp', 'pkm_type', 'status', 'asleep', 'moves', 'pp', 'order', 'stage', 'confused',
+               'weather', 'weather_turns')
+
+  @classmethod
+  def from_state(cls, g: GameState, moves: list = None) -> 'SimState':
+    # moves: mosse già impacchettate dello stesso stato (vedi pack_moves), per non rifarle
+    sim = cls()
+    members = team_members(g)
+    sim.hp = [[pkm.hp for pkm in pkms] for pkms in members]
+    sim.max_hp = [[pkm.max_hp for pkm in pkms] for pkms in members]
+    sim.pkm_type = [[int(pkm.type) for pkm in pkms] for pkms in members]
+    sim.status = [[int(pkm.status) for pkm in pkms] for pkms in members]
+    sim.asleep = [[pkm.n_turns_asleep for pkm in pkms] for pkms in members]
+    # le mosse impacchettate non cambiano durante la ricerca e sono condivise tra le copie
+    sim.moves = moves if moves is not None else pack_moves(g)
+    sim.pp = [[[move.pp for move in pkm.moves] for pkm in pkms] for pkms in members]
+    sim.order = [list(range(len(pkms))) for pkms in members]
+    sim.stage = [list(team.stage) for team in g.teams]
+    sim.confused = [team.confused for team in g.teams]
+    sim.weather = int(g.weather.condition)
+    sim.weather_turns = g.weather.n_turns_no_clear
+    return sim
+
+  def copy(self) -> 'SimState':
+    sim = SimState()
+    sim.hp = [list(hp) for hp in self.hp]
+    sim.max_hp = self.max_hp
+    sim.pkm_type = self.pkm_type
+    sim.status = [list(status) for status in self.status]
+    sim.asleep = [list(asleep) for asleep in self.asleep]
+    sim.moves = self.moves
+    sim.pp = [[list(pp) for pp in side] for side in self.pp]
+    sim.order = [list(order) for order in self.order]
+    sim.stage = [list(stage) for stage in self.stage]
+    sim.confused = list(self.confused)
+    sim.weather = self.weather
+    sim.weather_turns = self.weather_turns
+    return sim
+
+  def apply_to(self, g: GameState) -> None:
+    # scrive lo stato simulato sul GameState da cui è stato creato (es. la copia di SearchState)
+    members = team_members(g)
+    for s, team in enumerate(g.teams):
+      pkms = members[s]
+      for p, pkm in enumerate(pkms):
+        pkm.hp = self.hp[s][p]
+        pkm.status = PkmStatus(self.status[s][p])
+        pkm.n_turns_asleep = self.asleep[s][p]
+        for move, pp in zip(pkm.moves, self.pp[s][p]):
+          move.pp = pp
+      order = self.order[s]
+      team.active = pkms[order[0]]
+      for j in range(len(team.party)):
+        team.party[j] = pkms[order[j+1]]
+      team.stage[:] = self.stage[s]
+      team.confused = self.confused[s]
+    g.weather.condition = WeatherCondition(self.weather)
+    g.weather.n_turns_no_clear = self.weather_turns
+
+  def fainted(self, side: int) -> bool:
+    return all(hp <= 0 for hp in self.hp[side])
+
+  def legal_actions(self, side: int) -> List[int]:
+    # come legal_actions di SearchState
+    order = self.order[side]
+    hp = self.hp[side]
+    switches = [N_MOVES + j for j in range(len(order) - 1) if hp[order[j+1]] > 0]
+    active = order[0]
+    if hp[active] <= 0 and len(switches) > 0:
+      return switches
+    actions = [m for m, pp in enumerate(self.pp[side][active]) if pp > 0]
+    if len(actions) == 0:
+      actions = list(range(N_MOVES))
+    return actions + switches
+
+  def step(self, actions: List[int], rng: random.Random = random) -> None:
+    for s in range(2):
+      if actions[s] >= N_MOVES:
+        self._switch(s, actions[s] - N_MOVES + 1)
+    first = self._first_mover(actions, rng)
+    for s in (first, 1 - first):
+      if actions[s] < N_MOVES:
+        self._attack(s, actions[s], rng)
+    self._end_of_turn()
+
+  def _switch(self, s: int, pos: int) -> None:
+    order = self.order[s]
+    if pos < len(order) and self.hp[s][order[pos]] > 0:
+      order[0], order[pos] = order[pos], order[0]
+      self.stage[s] = [0] * len(self.stage[s])
+      self.confused[s] = False
+
+  def _first_mover(self, actions: List[int], rng: random.Random) -> int:
+    priority = [actions[s] < N_MOVES and self.moves[s][self.order[s][0]][actions[s]][M_PRIORITY] for s in range(2)]
+    if priority[0] != priority[1]:
+      return 0 if priority[0] else 1
+    speed0 = self.stage[0][PkmStat.SPEED]
+    speed1 = self.stage[1][PkmStat.SPEED]
+    if speed0 != speed1:
+      return 0 if speed0 > speed1 else 1
+    return 1 if rng.random() < .5 else 0
+
+  def _attack(self, s: int, m: int, rng: random.Random) -> None:
+    o = 1 - s
+    att = self.order[s][0]
+    dfn = self.order[o][0]
+    hp = self.hp
+    if hp[s][att] <= 0:
+      return
+    # status che possono far saltare il turno
+    status = self.status[s][att]
+    if status == PkmStatus.SLEEP:
+      if rng.random() < WAKE_PROB:
+        self.status[s][att] = PkmStatus.NONE
+        self.asleep[s][att] = 0
+      else:
+        self.asleep[s][att] += 1
+      return
+    if status == PkmStatus.FROZEN:
+      if rng.random() >= THAW_PROB:
+        return
+      self.status[s][att] = PkmStatus.NONE
+    if status == PkmStatus.PARALYZED and rng.random() < PARALYSIS_SKIP:
+      return
+    if self.confused[s] and rng.random() < CONFUSION_HIT:
+      hp[s][att] = max(0., hp[s][att] - STATE_DAMAGE * self.max_hp[s][att])
+      return
+    move = self.moves[s][att][m]
+    pp = self.pp[s][att]
+    if pp[m] <= 0 or not move[M_KNOWN]:
+      return
+    pp[m] -= 1
+    if rng.random() >= move[M_ACC]:
+      return
+    damage = sim_damage(move, self.pkm_type[s][att], self.pkm_type[o][dfn], self.stage[s][PkmStat.ATTACK],
+                        self.stage[o][PkmStat.DEFENSE], self.weather)
+    hp[o][dfn] = max(0., hp[o][dfn] - damage)
+    if move[M_RECOVER] > 0:
+      hp[s][att] = min(self.max_hp[s][att], hp[s][att] + move[M_RECOVER])
+    if move[M_EFFECT] and rng.random() < move[M_PROB]:
+      t = o if move[M_TARGET] == 1 else s
+      target = self.order[t][0]
+      if move[M_STATUS] == PkmStatus.CONFUSED:
+        self.confused[t] = True
+      elif move[M_STATUS] != PkmStatus.NONE and self.status[t][target] == PkmStatus.NONE and hp[t][target] > 0:
+        self.status[t][target] = move[M_STATUS]
+      if move[M_STAGE] != 0:
+        stage = self.stage[t]
+        stage[move[M_STAT]] = min(MAX_STAGE, max(-MAX_STAGE, stage[move[M_STAT]] + move[M_STAGE]))
+      if move[M_WEATHER] != WeatherCondition.CLEAR:
+        self.weather = move[M_WEATHER]
+        self.weather_turns = 0
+
+  def _end_of_turn(self) -> None:
+    for s in range(2):
+      p = self.order[s][0]
+      if self.hp[s][p] <= 0:
+        continue
+      chip = WEATHER_DAMAGE[self.weather][self.pkm_type[s][p]]
+      if self.status[s][p] == PkmStatus.BURNED or self.status[s][p] == PkmStatus.POISONED:
+        chip += 1
+      if chip > 0:
+        self.hp[s][p] = max(0., self.hp[s][p] - chip * STATE_DAMAGE * self.max_hp[s][p])
+    if self.weather != WeatherCondition.CLEAR:
+      self.weather_turns += 1
+      if self.weather_turns >= WEATHER_TURNS:
+        self.weather = int(WeatherCondition.CLEAR)
+        self.weather_turns = 0
+
+class SimBatch(RolloutBatch):
+  # backend numpy: le stesse regole di SimState su molte battaglie insieme, con i danni e
+  # l'ordine di RolloutBatch
+
+  def __init__(self, n: int):
+    super().__init__(n)
+    self.status = np.zeros((n, 2, N_PKM), dtype=np.intp)
+    self.confused = np.zeros((n, 2), dtype=bool)
+    self.weather_turns = np.zeros(n, dtype=np.intp)
+    self.move_status = np.zeros((n, 2, N_PKM, N_MOVES), dtype=np.intp)
+    self.prob = np.zeros((n, 2, N_PKM, N_MOVES))
+    self.move_stat = np.zeros((n, 2, N_PKM, N_MOVES), dtype=np.intp)
+    self.move_stage = np.zeros((n, 2, N_PKM, N_MOVES))
+    self.target = np.ones((n, 2, N_PKM, N_MOVES), dtype=np.intp)
+    self.recover = np.zeros((n, 2, N_PKM, N_MOVES))
+    self.move_weather = np.zeros((n, 2, N_PKM, N_MOVES), dtype=np.intp)
+    self.effect = np.zeros((n, 2, N_PKM, N_MOVES), dtype=bool)
+
+  @classmethod
+  def from_states(cls, states: List[GameState]) -> 'SimBatch':
+    batch = super().from_states(states)
+    for b, g in enumerate(states):
+      batch.weather_turns[b] = g.weather.n_turns_no_clear
+      for s, pkms in enumerate(team_members(g)):
+        batch.confused[b, s] = g.teams[s].confused
+        for p, pkm in enumerate(pkms):
+          batch.status[b, s, p] = int(pkm.status)
+          for m, move in enumerate(pkm.moves):
+            if move.name is None:
+              continue
+            packed = pack_move(move)
+            batch.move_status[b, s, p, m] = packed[M_STATUS]
+            batch.prob[b, s, p, m] = packed[M_PROB]
+            batch.move_stat[b, s, p, m] = packed[M_STAT]
+            batch.move_stage[b, s, p, m] = packed[M_STAGE]
+            batch.target[b, s, p, m] = packed[M_TARGET]
+            batch.recover[b, s, p, m] = packed[M_RECOVER]
+            batch.move_weather[b, s, p, m] = packed[M_WEATHER]
+            batch.effect[b, s, p, m] = packed[M_EFFECT]
+    return batch
+
+  def switch(self, actions: np.ndarray) -> np.ndarray:
+    switched = super().switch(actions)
+    self.stage[switched] = 0
+    self.confused[switched] = False
+    return switched
+
+  def step(self, actions: np.ndarray, rng: np.random.Generator) -> None:
+    b = np.arange(self.n)
+    self.switch(actions)
+    move = np.minimum(actions, N_MOVES - 1)
+    attacks = actions < N_MOVES
+    first = self.first_mover(actions, rng)
+    for turn in range(2):
+      attacker = first if turn == 0 else 1 - first
+      for s in range(2):
+        self._attack(s, move[:, s], (attacker == s) & attacks[:, s], rng)
+    self._end_of_turn()
+
+  def _attack(self, s: int, move: np.ndarray, acting: np.ndarray, rng: np.random.Generator) -> None:
+    b = np.arange(self.n)
+    o = 1 - s
+    att = self.active()[:, s]
+    acting = acting & (self.hp[b, s, att] > 0)
+    status = self.status[b, s, att]
+    asleep = acting & (status == PkmStatus.SLEEP)
+    wake = asleep & (rng.random(self.n) < WAKE_PROB)
+    frozen = acting & (status == PkmStatus.FROZEN)
+    thaw = frozen & (rng.random(self.n) < THAW_PROB)
+    self.status[b, s, att] = np.where(wake | thaw, PkmStatus.NONE, status)
+    paralyzed = acting & (status == PkmStatus.PARALYZED) & (rng.random(self.n) < PARALYSIS_SKIP)
+    acting &= ~asleep & ~(frozen & ~thaw) & ~paralyzed
+    confusion = acting & self.confused[:, s] & (rng.random(self.n) < CONFUSION_HIT)
+    self_hp = self.hp[b, s, att]
+    self.hp[b, s, att] = np.where(confusion, np.maximum(0., self_hp - STATE_DAMAGE * self.max_hp[b, s, att]), self_hp)
+    acting &= ~confusion
+    # una mossa sconosciuta ha pp 0 (vedi RolloutBatch.from_states)
+    acting &= self.pp[b, s, att, move] > 0
+    # il danno va calcolato prima di consumare il pp (damage vale 0 senza pp)
+    damage = self.damage(s, move)
+    self.pp[b, s, att, move] -= acting
+    hit = acting & (rng.random(self.n) < self.acc[b, s, att, move])
+    dfn = self.active()[:, o]
+    hp = self.hp[b, o, dfn]
+    self.hp[b, o, dfn] = np.where(hit, np.maximum(0., hp - damage), hp)
+    recover = self.recover[b, s, att, move]
+    self.hp[b, s, att] = np.where(hit & (recover > 0), np.minimum(self.max_hp[b, s, att], self.hp[b, s, att] + recover),
+                                  self.hp[b, s, att])
+    effect = hit & self.effect[b, s, att, move] & (rng.random(self.n) < self.prob[b, s, att, move])
+    t = np.where(self.target[b, s, att, move] == 1, o, s)
+    target = self.order[b, t, 0]
+    move_status = self.move_status[b, s, att, move]
+    self.confused[b, t] |= effect & (move_status == PkmStatus.CONFUSED)
+    inflict = (effect & (move_status != PkmStatus.CONFUSED) & (move_status != PkmStatus.NONE)
+               & (self.status[b, t, target] == PkmStatus.NONE) & (self.hp[b, t, target] > 0))
+    self.status[b, t, target] = np.where(inflict, move_status, self.status[b, t, target])
+    stat = self.move_stat[b, s, att, move]
+    self.stage[b, t, stat] = np.clip(self.stage[b, t, stat] + np.where(effect, self.move_stage[b, s, att, move], 0.),
+                                     -MAX_STAGE, MAX_STAGE)
+    weather = self.move_weather[b, s, att, move]
+    change = effect & (weather != WeatherCondition.CLEAR)
+    self.weather = np.where(change, weather, self.weather)
+    self.weather_turns = np.where(change, 0, self.weather_turns)
+
+  def _end_of_turn(self) -> None:
+    b = np.arange(self.n)
+    for s in range(2):
+      p = self.active()[:, s]
+      hp = self.hp[b, s, p]
+      status = self.status[b, s, p]
+      chip = WEATHER_DAMAGE_CHART[self.weather, self.pkm_type[b, s, p]]
+      chip += (status == PkmStatus.BURNED) | (status == PkmStatus.POISONED)
+      self.hp[b, s, p] = np.where(hp > 0, np.maximum(0., hp - chip * STATE_DAMAGE * self.max_hp[b, s, p]), hp)
+    active_weather = self.weather != WeatherCondition.CLEAR
+    self.weather_turns = np.where(active_weather, self.weather_turns + 1, self.weather_turns)
+    expired = active_weather & (self.weather_turns >= WEATHER_TURNS)
+    self.weather = np.where(expired, int(WeatherCondition.CLEAR), self.weather)
+    self.weather_turns = np.where(expired, 0, self.weather_turns)
+
+# confronto con il motore
+
+FIELDS = ('order', 'hp', 'status', 'stage', 'confused', 'weather')
+
+def engine_view(g: GameState, members: List[List[Pkm]]) -> Dict[str, tuple]:
+  # campi confrontabili di un GameState, con i pokemon indicizzati come in SimState
+  def position(pkm, pkms):
+    return next(i for i, other in enumerate(pkms) if other is pkm)
+  return dict(
+    order=tuple(tuple(position(pkm, pkms) for pkm in [team.active] + list(team.party)) for team, pkms in zip(g.teams, members)),
+    hp=tuple(round(pkm.hp, 6) for pkms in members for pkm in pkms),
+    status=tuple(int(pkm.status) for pkms in members for pkm in pkms),
+    stage=tuple(tuple(team.stage) for team in g.teams),
+    confused=tuple(bool(team.confused) for team in g.teams),
+    weather=(int(g.weather.condition), g.weather.n_turns_no_clear))
+
+def sim_view(sim: SimState) -> Dict[str, tuple]:
+  return dict(
+    order=tuple(tuple(order) for order in sim.order),
+    hp=tuple(round(hp, 6) for side in sim.hp for hp in side),
+    status=tuple(int(status) for side in sim.status for status in side),
+    stage=tuple(tuple(stage) for stage in sim.stage),
+    confused=tuple(bool(confused) for confused in sim.confused),
+    weather=(int(sim.weather), sim.weather_turns))
+
+def batch_view(batch: SimBatch, b: int) -> Dict[str, tuple]:
+  return dict(
+    order=tuple(tuple(int(p) for p in batch.order[b, s]) for s in range(2)),
+    hp=tuple(round(float(hp), 6) for hp in batch.hp[b].ravel()),
+    status=tuple(int(status) for status in batch.status[b].ravel()),
+    stage=tuple(tuple(int(stage) for stage in batch.stage[b, s]) for s in range(2)),
+    confused=tuple(bool(confused) for confused in batch.confused[b]),
+    weather=(int(batch.weather[b]), int(batch.weather_turns[b])))
+
+def random_variant(g: GameState, rng: random.Random) -> GameState:
+  # variante deterministica di una posizione: mosse nascoste stimate, hp, stage, status e meteo
+  # casuali, esiti imposti (acc e prob a 0 o 1), velocità diverse e nessuno status che estrae
+  # numeri a ogni turno (sonno, gelo, paralisi, confusione), così il motore non usa il caso
+  state = deepcopy(g)
+  belief = OpponentBelief()
+  for team in state.teams:
+    belief.fill_team(team, rng, active_only=False)
+    team.confused = False
+    for stat in range(len(team.stage)):
+      team.stage[stat] = rng.randint(-2, 2)
+  state.teams[1].stage[PkmStat.SPEED] = state.teams[0].stage[PkmStat.SPEED] + rng.choice([-1, 1])
+  for pkms in team_members(state):
+    for pkm in pkms:
+      pkm.hp = pkm.max_hp * rng.choice([1., rng.uniform(.05, 1.)])
+      pkm.status = rng.choice([PkmStatus.NONE, PkmStatus.NONE, PkmStatus.BURNED, PkmStatus.POISONED])
+      for move in pkm.moves:
+        move.acc = 1. if rng.random() < move.acc else 0.
+        move.prob = 1. if rng.random() < move.prob else 0.
+        # gli status casuali non possono essere inflitti, altrimenti il turno dopo non è deterministico
+        if move.status in (PkmStatus.SLEEP, PkmStatus.FROZEN, PkmStatus.PARALYZED, PkmStatus.CONFUSED):
+          move.prob = 0.
+  state.weather.condition = rng.choice(list(WeatherCondition))
+  state.weather.n_turns_no_clear = 0 if state.weather.condition == WeatherCondition.CLEAR else rng.randint(0, WEATHER_TURNS - 1)
+  return state
+
+def differential_test(positions: List[GameState], n_variants: int = 20, seed: int = 0, batch: bool = True) -> dict:
+  # gioca ogni coppia di azioni su n_variants varianti di ogni posizione con GameState.step,
+  # con SimState e (se batch) con SimBatch, e conta i casi in cui i campi dello stato dopo il
+  # turno non coincidono; con le posizioni del benchmark (PolicyBenchmark.load_corpus) e il
+  # valore predefinito sono diverse migliaia di stati
+  rng = random.Random(seed)
+  np_rng = np.random.default_rng(seed)
+  variants = [random_variant(g, rng) for g in positions for _ in range(n_variants)]
+  joint = [(a0, a1) for a0 in range(DEFAULT_N_ACTIONS) for a1 in range(DEFAULT_N_ACTIONS)]
+  backends = ['sim', 'batch'] if batch else ['sim']
+  mismatches = {backend: {field: 0 for field in FIELDS} for backend in backends}
+  disagree = {backend: 0 for backend in backends}
+  elapsed = {backend: 0. for backend in ['engine'] + backends}
+  n = 0
+  for g in variants:
+    sim = SimState.from_state(g)
+    views = {backend: [] for backend in backends}
+    for actions in joint:
+      state = deepcopy(g)
+      members = team_members(state)
+      start = time.perf_counter()
+      state.step(list(actions))
+      elapsed['engine'] += time.perf_counter() - start
+      expected = engine_view(state, members)
+      copy = sim.copy()
+      start = time.perf_counter()
+      copy.step(list(actions), rng)
+      elapsed['sim'] += time.perf_counter() - start
+      views['sim'].append((expected, sim_view(copy)))
+      n += 1
+    if batch:
+      states = SimBatch.from_states([g] * len(joint))
+      start = time.perf_counter()
+      states.step(np.array(joint), np_rng)
+      elapsed['batch'] += time.perf_counter() - start
+      views['batch'] = [(expected, batch_view(states, b)) for b, (expected, _) in enumerate(views['sim'])]
+    for backend in backends:
+      for expected, got in views[backend]:
+        wrong = [field for field in FIELDS if expected[field] != got[field]]
+        for field in wrong:
+          mismatches[backend][field] += 1
+        disagree[backend] += len(wrong) > 0
+  report = {'states': len(variants), 'steps': n,
+            'engine_steps_per_sec': n / elapsed['engine'] if elapsed['engine'] > 0 else 0.}
+  for backend in backends:
+    report[backend] = {'disagreement_rate': disagree[backend] / n if n > 0 else 0.,
+                       'by_field': {field: count / n for field, count in mismatches[backend].items()},
+                       'steps_per_sec': n / elapsed[backend] if elapsed[backend] > 0 else 0.}
+  return report
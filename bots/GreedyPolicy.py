@@ -11,31 +11,7 @@ from vgc.datatypes.Objects import GameState, PkmTeam, PkmType, Pkm, PkmMove, Pkm
 from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
 from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
 
-  
-def match_up_eval(my_pkm_type: PkmType,
-      opp_pkm_type: PkmType,
-      my_moves_type: List[PkmType],
-      opp_moves_type: List[PkmType]
-  ) -> float:
-  # determine defensive match up
-  defensive_match_up = 0.
-  for mtype in opp_moves_type:
-    if mtype == opp_pkm_type:
-      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type]*1.5, defensive_match_up)
-    else:
-      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], defensive_match_up)
-  #print(f'DEFENSIVE MATCH UP: {defensive_match_up}')
-
-  offensive_match_up = 0.
-  for mtype in my_moves_type:
-    if mtype == opp_pkm_type:
-      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][opp_pkm_type]*1.5, offensive_match_up)
-    else:
-      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], offensive_match_up)
-  #print(f'OFFENSIVE MATCH UP: {offensive_match_up}')
-    
-  return offensive_match_up - defensive_match_up
-
+from bots.PkmTables import match_up_eval, calculate_damage
 
 def n_fainted(team: PkmTeam) -> int:
   fainted = 0
@@ -46,34 +22,6 @@ def n_fainted(team: PkmTeam) -> int:
     fainted += team.party[1].hp == 0
   return fainted
 
-def calculate_damage(move: PkmMove, pkm_type: PkmType, opp_pkm_type: PkmType, attack_stage: int, defense_stage: int, weather: WeatherCondition) -> float:
-    if move.pp <= 0:
-      return 0
-    if move.name is None:
-      return 0
-    move_type: PkmType = move.type
-    move_power: float = move.power
-    type_rate = TYPE_CHART_MULTIPLIER[move_type][opp_pkm_type]
-    if type_rate == 0:
-        return 0
-    if move.fixed_damage > 0:
-        return move.fixed_damage
-    stab = 1.5 if move_type == pkm_type else 1.
-    if (move_type == PkmType.WATER and weather == WeatherCondition.RAIN) or (
-            move_type == PkmType.FIRE and weather == WeatherCondition.SUNNY):
-        weather = 1.5
-    elif (move_type == PkmType.WATER and weather == WeatherCondition.SUNNY) or (
-            move_type == PkmType.FIRE and weather == WeatherCondition.RAIN):
-        weather = .5
-    else:
-        weather = 1.
-    stage_level = attack_stage - defense_stage
-    stage = (stage_level + 2.) / 2 if stage_level >= 0. else 2. / \
-        (np.abs(stage_level) + 2.)
-    damage = type_rate * \
-        stab * weather * stage * move_power
-    return damage
-
 def canAttackFirst(my_team:PkmTeam, opp_team:PkmTeam, opp_active:Pkm) -> int:
     
     speed0 = my_team.stage[PkmStat.SPEED]
@@ -0,0 +1,101 @@
+from typing import Dict, List, Tuple
+
+import math
+
+from vgc.datatypes.Objects import GameState, Pkm, PkmTeam
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.AlphaBetaPolicy import game_state_eval, stage_eval, status_eval
+from bots.PkmTables import match_up_eval
+
+# Valutazione incrementale per la ricerca: ogni nodo porta i termini di game_state_eval
+# (match up, hp degli attivi, somme degli stage, status degli attivi, hp del party) e dopo
+# uno step si ricalcolano solo quelli che la coppia di azioni può aver cambiato:
+# - hp e status degli attivi cambiano quasi a ogni turno (danni, meteo, risvegli) e si rileggono sempre
+# - il match up dipende solo dalla coppia di attivi (le mosse non cambiano durante la ricerca),
+#   quindi si ricalcola dopo un cambio, con una cache per coppia
+# - gli stage cambiano solo con mosse che hanno uno stage o con un cambio
+# - gli hp del party cambiano solo quando cambia il nostro attivo
+# I termini sono combinati nello stesso ordine di game_state_eval, così il valore è identico;
+# con debug=True ogni valutazione viene confrontata con quella completa.
+
+MY_ACTIVE, OPP_ACTIVE, MATCH_UP, MY_HP, OPP_HP, MY_STAGE, OPP_STAGE, MY_STATUS, OPP_STATUS, PARTY_HP = range(10)
+
+def party_hp(team: PkmTeam) -> float:
+  return team.party[0].hp/team.party[0].max_hp+team.party[1].hp/team.party[1].max_hp
+
+class EvalAccumulator():
+
+  def __init__(self, debug: bool = False):
+    self.debug = debug
+    self._match_ups: Dict[Tuple[int, int], float] = {}
+    # termini ricalcolati rispetto a una valutazione completa, per misurare il risparmio
+    self.n_updates: int = 0
+    self.n_match_ups: int = 0
+
+  def new_search(self) -> None:
+    # ogni ricerca lavora su una nuova copia dello stato: la cache dei match up riparte da zero
+    self._match_ups = {}
+
+  def _match_up(self, my_active: Pkm, opp_active: Pkm) -> float:
+    key = (id(my_active), id(opp_active))
+    match_up = self._match_ups.get(key)
+    if match_up is None:
+      self.n_match_ups += 1
+      match_up = match_up_eval(my_active.type, opp_active.type,
+          list(map(lambda m: m.type, my_active.moves)),
+          list(map(lambda m: m.type, [move for move in opp_active.moves if move.name != None])))
+      self._match_ups[key] = match_up
+    return match_up
+
+  def terms(self, g: GameState) -> tuple:
+    my_team = g.teams[0]
+    opp_team = g.teams[1]
+    my_active = my_team.active
+    opp_active = opp_team.active
+    return (my_active, opp_active, self._match_up(my_active, opp_active),
+            my_active.hp/my_active.max_hp, opp_active.hp/opp_active.max_hp,
+            stage_eval(my_team), stage_eval(opp_team),
+            status_eval(my_active), status_eval(opp_active), party_hp(my_team))
+
+  @staticmethod
+  def stage_changing(g: GameState, actions: List[int]) -> bool:
+    # vero se una delle due azioni è una mossa che modifica gli stage (va chiamata prima dello step)
+    for team, action in zip(g.teams, actions):
+      if action < DEFAULT_N_ACTIONS-2 and getattr(team.active.moves[action], 'stage', 0) != 0:
+        return True
+    return False
+
+  def update(self, terms: tuple, g: GameState, stage_changed: bool) -> tuple:
+    # termini dello stato g, ottenuto con uno step dallo stato dei termini terms
+    self.n_updates += 1
+    my_team = g.teams[0]
+    opp_team = g.teams[1]
+    my_active = my_team.active
+    opp_active = opp_team.active
+    my_switch = my_active is not terms[MY_ACTIVE]
+    switch = my_switch or opp_active is not terms[OPP_ACTIVE]
+    match_up = self._match_up(my_active, opp_active) if switch else terms[MATCH_UP]
+    if stage_changed or switch:
+      my_stage, opp_stage = stage_eval(my_team), stage_eval(opp_team)
+    else:
+      my_stage, opp_stage = terms[MY_STAGE], terms[OPP_STAGE]
+    return (my_active, opp_active, match_up,
+            my_active.hp/my_active.max_hp, opp_active.hp/opp_active.max_hp,
+            my_stage, opp_stage, status_eval(my_active), status_eval(opp_active),
+            party_hp(my_team) if my_switch else terms[PARTY_HP])
+
+  def value(self, terms: tuple, depth: int, g: GameState = None) -> float:
+    value = (terms[MATCH_UP]
+             + terms[MY_HP]*3
+             - terms[OPP_HP]*3
+             + 0.2*terms[MY_STAGE]
+             - 0.2*terms[OPP_STAGE]
+             + terms[MY_STATUS]
+             - terms[OPP_STATUS]
+             - 0.3*math.ceil(depth/2)
+             + terms[PARTY_HP]*2)
+    if self.debug and g is not None:
+      expected = game_state_eval(g, depth)
+      assert abs(value - expected) <= 1e-9, f'incremental eval {value} differs from game_state_eval {expected}'
+    return value
@@ -0,0 +1,235 @@
+from typing import Dict, List, Tuple
+
+import math
+import numpy as np
+import random
+import time
+
+from vgc.behaviour import BattlePolicy
+from vgc.datatypes.Objects import GameState, PkmTeam
+
+from bots.AlphaBetaPolicy import game_state_eval, stage_eval, status_eval
+from bots.BatchRollout import RolloutBatch, rollout_value
+from bots.FastSim import SimState, current_moves, pack_moves_by_pkm
+from bots.GreedyPolicy import GreedyPolicy
+from bots.OpponentBelief import OpponentBelief
+from bots.PkmTables import match_up_eval
+from bots.SearchState import SearchState, legal_actions, team_pkms
+
+# MCTS per mosse simultanee (decoupled UCT): in ogni nodo i due giocatori scelgono
+# ciascuno la propria azione con UCB1 sulle proprie statistiche, ignorando la scelta
+# dell'altro; il figlio è quello della coppia di azioni. Lo stato viene copiato una
+# volta per get_action e ogni iterazione applica e annulla i turni con SearchState.
+
+# scala per portare game_state_eval in [0, 1] con una sigmoide
+EVAL_SCALE = 3.
+
+def team_fainted(team: PkmTeam) -> bool:
+  if team.active.hp > 0:
+    return False
+  for pkm in team.party:
+    if pkm.hp > 0:
+      return False
+  return True
+
+def reward(g: GameState) -> float:
+  # valore per il giocatore 0 in [0, 1]; l'avversario riceve 1 - reward
+  if team_fainted(g.teams[1]):
+    return 1.
+  if team_fainted(g.teams[0]):
+    return 0.
+  return 1. / (1. + math.exp(-game_state_eval(g, 0) / EVAL_SCALE))
+
+def batch_rewards(g: GameState, batch: RolloutBatch) -> np.ndarray:
+  # reward() degli stati finali dei rollout vettoriali partiti da g: il rollout cambia solo hp,
+  # pp e ordine dei pokemon, per cui match up e status (per posizione) e stage vengono da g
+  pkms = [team_pkms(team) for team in g.teams]
+  match_up = np.array([[match_up_eval(my.type, opp.type, [move.type for move in my.moves],
+                                      [move.type for move in opp.moves if move.name is not None])
+                        for opp in pkms[1]] for my in pkms[0]])
+  status = np.array([[status_eval(pkm) for pkm in side] for side in pkms], dtype=np.float64)
+  b = np.arange(batch.n)
+  frac = batch.hp / batch.max_hp
+  order = batch.order
+  my, opp = order[:, 0, 0], order[:, 1, 0]
+  evaluation = (match_up[my, opp]
+                + frac[b, 0, my]*3
+                - frac[b, 1, opp]*3
+                + 0.2*stage_eval(g.teams[0])
+                - 0.2*stage_eval(g.teams[1])
+                + status[0, my]
+                - status[1, opp]
+                + (frac[b, 0, order[:, 0, 1]] + frac[b, 0, order[:, 0, 2]])*2)
+  value = 1. / (1. + np.exp(-evaluation / EVAL_SCALE))
+  alive = batch.alive().any(axis=2)
+  return np.where(~alive[:, 1], 1., np.where(~alive[:, 0], 0., value))
+
+class MCTSNode():
+
+  def __init__(self, g: GameState):
+    self.actions: Tuple[List[int], List[int]] = (legal_actions(g.teams[0]), legal_actions(g.teams[1]))
+    self.n: int = 0
+    # statistiche separate per giocatore: visite e somma delle ricompense di ogni azione
+    self.action_n: Tuple[Dict[int, int], Dict[int, int]] = ({a: 0 for a in self.actions[0]}, {a: 0 for a in self.actions[1]})
+    self.action_w: Tuple[Dict[int, float], Dict[int, float]] = ({a: 0. for a in self.actions[0]}, {a: 0. for a in self.actions[1]})
+    self.children: Dict[Tuple[int, int], 'MCTSNode'] = {}
+
+  def select(self, side: int, c: float, rng: random.Random) -> int:
+    n = self.action_n[side]
+    w = self.action_w[side]
+    untried = [a for a in self.actions[side] if n[a] == 0]
+    if len(untried) > 0:
+      return rng.choice(untried)
+    log_n = math.log(self.n)
+    best, best_value = None, -math.inf
+    for a in self.actions[side]:
+      value = w[a] / n[a] + c * math.sqrt(log_n / n[a])
+      if value > best_value:
+        best, best_value = a, value
+    return best
+
+  def update(self, joint: Tuple[int, int], value: float) -> None:
+    self.n += 1
+    self.action_n[0][joint[0]] += 1
+    self.action_w[0][joint[0]] += value
+    self.action_n[1][joint[1]] += 1
+    self.action_w[1][joint[1]] += 1. - value
+
+class MCTSPolicy(BattlePolicy):
+
+  def __init__(self, n_iterations: int = 1000, time_budget: float = None, rollout_depth: int = 3,
+      max_tree_depth: int = 10, greedy_rollout: bool = False, c: float = 0.7, seed: int = 69,
+      batch_rollouts: int = 0, fast_sim: bool = False):
+    # con time_budget (secondi per get_action) le iterazioni proseguono fino allo scadere del tempo,
+    # altrimenti se ne fanno n_iterations
+    self.n_iterations = n_iterations
+    self.time_budget = time_budget
+    # turni giocati in ogni rollout prima di valutare lo stato con game_state_eval
+    self.rollout_depth = rollout_depth
+    self.max_tree_depth = max_tree_depth
+    # con greedy_rollout il giocatore 0 segue GreedyPolicy nei rollout, altrimenti azioni casuali
+    self.greedy = GreedyPolicy() if greedy_rollout else None
+    # con batch_rollouts > 0 ogni foglia viene stimata con tanti rollout vettoriali (bots/BatchRollout.py)
+    # invece che con un rollout attraverso GameState.step
+    self.batch_rollouts = batch_rollouts
+    # con fast_sim i rollout casuali avanzano sul modello ridotto di bots/FastSim.py invece che
+    # con GameState.step; lo stato finale viene riscritto sulla copia per valutarlo
+    self.fast_sim = fast_sim
+    self._sim_moves: list = None
+    self.c = c
+    self.rng: random.Random = random.Random(seed)
+    self.np_rng: np.random.Generator = np.random.default_rng(seed)
+    self.belief: OpponentBelief = OpponentBelief()
+    self._search: SearchState = None
+    self.n_nodes: int = 0
+    self.n_rollouts: int = 0
+    self.max_ply: int = 0
+
+  def reseed(self, seed: int) -> None:
+    self.rng = random.Random(seed)
+    self.np_rng = np.random.default_rng(seed)
+    self.belief = OpponentBelief()
+
+  def get_action(self, g: GameState) -> int:
+    self._search = SearchState(g)
+    state = self._search.root
+    # le mosse sconosciute vengono stimate sulla copia, lo stato reale non viene toccato
+    self.belief.observe(g)
+    self.belief.fill(state.teams[1].active, self.rng)
+    # le mosse (e le stime di quelle nascoste) restano le stesse per tutta la ricerca; sono
+    # indicizzate per pokemon perché i cambi nell'albero spostano l'attivo
+    self._sim_moves = pack_moves_by_pkm(state) if self.fast_sim else None
+    actions = legal_actions(state.teams[0])
+    if len(actions) == 1:
+      return actions[0]
+    root = MCTSNode(state)
+    self.n_nodes = 1
+    self.n_rollouts = 0
+    self.max_ply = 0
+    deadline = None if self.time_budget is None else time.perf_counter() + self.time_budget
+    iteration = 0
+    while (iteration < self.n_iterations) if deadline is None else (iteration == 0 or time.perf_counter() < deadline):
+      self._iterate(root, state)
+      iteration += 1
+    # azione più visitata dal giocatore 0
+    visits = root.action_n[0]
+    return max(root.actions[0], key=lambda a: visits[a])
+
+  def _iterate(self, root: MCTSNode, state: GameState) -> None:
+    search = self._search
+    node = root
+    path = []
+    depth = 0
+    value = None
+    while True:
+      joint = (node.select(0, self.c, self.rng), node.select(1, self.c, self.rng))
+      path.append((node, joint))
+      search.push(state)
+      search.step(state, list(joint))
+      depth += 1
+      if team_fainted(state.teams[0]) or team_fainted(state.teams[1]):
+        value = reward(state)
+        break
+      child = node.children.get(joint)
+      if child is None:
+        # espansione di un nuovo nodo e rollout da lì
+        node.children[joint] = MCTSNode(state)
+        self.n_nodes += 1
+        value = self._rollout(state)
+        break
+      node = child
+      if depth >= self.max_tree_depth:
+        value = reward(state)
+        break
+    if depth > self.max_ply:
+      self.max_ply = depth
+    for node, joint in path:
+      node.update(joint, value)
+    for _ in range(depth):
+      search.pop()
+
+  def _rollout(self, state: GameState) -> float:
+    if self.batch_rollouts > 0:
+      self.n_rollouts += self.batch_rollouts
+      # stessa funzione di valore delle foglie terminali e a profondità massima (reward)
+      return rollout_value(state, self.batch_rollouts, self.rollout_depth, self.np_rng, batch_rewards)
+    search = self._search
+    self.n_rollouts += 1
+    if self.fast_sim and self.greedy is None:
+      return self._sim_rollout(state)
+    n_turns = 0
+    while n_turns < self.rollout_depth and not team_fainted(state.teams[0]) and not team_fainted(state.teams[1]):
+      if self.greedy is not None and state.teams[0].active.hp > 0:
+        a0 = self.greedy._simple_search(state)
+      else:
+        a0 = self.rng.choice(legal_actions(state.teams[0]))
+      a1 = self.rng.choice(legal_actions(state.teams[1]))
+      search.push(state)
+      search.step(state, [a0, a1])
+      n_turns += 1
+    value = reward(state)
+    for _ in range(n_turns):
+      search.pop()
+    return value
+
+  def _sim_state(self, state: GameState) -> SimState:
+    return SimState.from_state(state, current_moves(state, self._sim_moves))
+
+  def _sim_rollout(self, state: GameState) -> float:
+    sim = self._sim_state(state)
+    n_turns = 0
+    while n_turns < self.rollout_depth and not sim.fainted(0) and not sim.fainted(1):
+      sim.step([self.rng.choice(sim.legal_actions(0)), self.rng.choice(sim.legal_actions(1))], self.rng)
+      n_turns += 1
+    search = self._search
+    search.push(state)
+    sim.apply_to(state)
+    value = reward(state)
+    search.pop()
+    return value
+
+  def search_stats(self) -> dict:
+    search = self._search
+    return dict(nodes=self.n_nodes, leaves=self.n_rollouts, cutoffs=0, depth=self.max_ply,
+                copies=search.n_copies if search is not None else 0,
+                steps=search.n_steps if search is not None else 0)
@@ -1,6 +1,5 @@
 import math
 from typing import Any, List, Union
-from copy import deepcopy
 
 import numpy as np
 import random
@@ -9,61 +8,14 @@ from vgc.behaviour import BattlePolicy
 from vgc.datatypes.Types import PkmStatus, WeatherCondition, PkmStat
 from vgc.datatypes.Objects import GameState, PkmTeam, PkmType, Pkm, PkmMove, PkmStatus
 from vgc.datatypes.Constants import DEFAULT_N_ACTIONS, TYPE_CHART_MULTIPLIER
-from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
 
-class Node():
+from bots.PkmTables import match_up_eval, calculate_damage
+from bots.AlphaBetaPolicy import AlphaBetaPolicy
+from bots.SearchState import legal_actions
 
-  def __init__(self):
-    self.action: int = None
-    self.gameState: GameState = None
-    self.parent: Node = None
-    self.depth: int = 0
-    self.value: float = 0.
-
-  def __str__(self):
-    return f'Node(action: {self.action}, depth: {self.depth}, value: {self.value}, parent: {str(self.parent)})'
-  
-def match_up_eval(my_pkm_type: PkmType,
-      opp_pkm_type: PkmType,
-      my_moves_type: List[PkmType],
-      opp_moves_type: List[PkmType]
-  ) -> float:
-  # determine defensive match up
-  defensive_match_up = 0.
-  for mtype in opp_moves_type:
-    if mtype == opp_pkm_type:
-      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type]*1.5, defensive_match_up)
-    else:
-      defensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], defensive_match_up)
-  #print(f'DEFENSIVE MATCH UP: {defensive_match_up}')
-
-  offensive_match_up = 0.
-  for mtype in my_moves_type:
-    if mtype == opp_pkm_type:
-      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][opp_pkm_type]*1.5, offensive_match_up)
-    else:
-      offensive_match_up = max(TYPE_CHART_MULTIPLIER[mtype][my_pkm_type], offensive_match_up)
-  #print(f'OFFENSIVE MATCH UP: {offensive_match_up}')
-    
-  return offensive_match_up - defensive_match_up
-
-def estimate_move(pkm: Pkm) -> None:
-  # controlla se è già presente una mossa del tipo del pokemon
-  type_m = sum([move.type==pkm.type for move in pkm.moves if move.name is not None])
-  for move_i in range(DEFAULT_N_ACTIONS-2):
-    if pkm.moves[move_i].name is None:
-      # se non è presente una mossa del tipo del pkm allora ne aggiungo una random
-      # prendo in considerazione solo mosse di attacco, che sono quelle che mi preoccupano di più
-      if type_m==0:
-        type_moves = [move for move in STANDARD_MOVE_ROSTER if move.type==pkm.type and move.power>0.0]
-        pkm.moves[move_i] = random.choice(type_moves)
-        type_m = 1
-      else:
-        # faccio in modo che sia diversa dalle mosse che ho già
-        move = random.choice(STANDARD_MOVE_ROSTER)
-        while(move in pkm.moves):
-          move = random.choice(STANDARD_MOVE_ROSTER)
-        pkm.moves[move_i] = move
+# livelli di decisione di MixedPolicy, dal più economico: azione obbligata, KO sicuro,
+# regole greedy con poche mosse avversarie note, ricerca alpha-beta
+TIERS = ('forced', 'decided', 'greedy', 'search')
 
 def known_opp_moves(pkm: Pkm) -> int:
   known = 0
@@ -72,43 +24,6 @@ def known_opp_moves(pkm: Pkm) -> int:
       known += 1
   return known
 
-def stage_eval(team: PkmTeam) -> int:
-  stage: int = 0
-  for s in team.stage:
-    stage += s
-  return stage
-
-def status_eval(pkm: Pkm) -> float:
-  if pkm.status == (PkmStatus.CONFUSED or PkmStatus.PARALYZED or PkmStatus.SLEEP or PkmStatus.FROZEN):
-    return -1
-  elif pkm.status == (PkmStatus.BURNED or PkmStatus.POISONED):
-    return -0.5
-  else:
-    return 0
-  
-def game_state_eval(g: GameState, depth: int):
-  my_team = g.teams[0]
-  opp_team  = g.teams[1]
-  my_active: Pkm = my_team.active
-  opp_active: Pkm = opp_team.active
-  match_up: float = match_up_eval(my_active.type, opp_active.type,
-      list(map(lambda m: m.type, my_active.moves)),
-      list(map(lambda m: m.type, [move for move in opp_active.moves if move.name != None])))
-  #print(f'MATCH UP: {match_up}')
-  my_stage = stage_eval(my_team)
-  opp_stage = stage_eval(opp_team)
-  my_status = status_eval(my_active)
-  opp_status = status_eval(opp_active)
-  return (match_up 
-          + my_active.hp/my_active.max_hp*3
-          - opp_active.hp/opp_active.max_hp*3
-          + 0.2*my_stage
-          - 0.2*opp_stage
-          + my_status
-          - opp_status
-          - 0.3*math.ceil(depth/2)
-          + (my_team.party[0].hp/my_team.party[0].max_hp+my_team.party[1].hp/my_team.party[1].max_hp)*2)
-
 def n_fainted(team: PkmTeam) -> int:
   fainted = 0
   fainted += team.active.hp == 0
@@ -118,34 +33,6 @@ def n_fainted(team: PkmTeam) -> int:
     fainted += team.party[1].hp == 0
   return fainted
 
-def calculate_damage(move: PkmMove, pkm_type: PkmType, opp_pkm_type: PkmType, attack_stage: int, defense_stage: int, weather: WeatherCondition) -> float:
-    if move.pp <= 0:
-      return 0
-    if move.name is None:
-      return 0
-    move_type: PkmType = move.type
-    move_power: float = move.power
-    type_rate = TYPE_CHART_MULTIPLIER[move_type][opp_pkm_type]
-    if type_rate == 0:
-        return 0
-    if move.fixed_damage > 0:
-        return move.fixed_damage
-    stab = 1.5 if move_type == pkm_type else 1.
-    if (move_type == PkmType.WATER and weather == WeatherCondition.RAIN) or (
-            move_type == PkmType.FIRE and weather == WeatherCondition.SUNNY):
-        weather = 1.5
-    elif (move_type == PkmType.WATER and weather == WeatherCondition.SUNNY) or (
-            move_type == PkmType.FIRE and weather == WeatherCondition.RAIN):
-        weather = .5
-    else:
-        weather = 1.
-    stage_level = attack_stage - defense_stage
-    stage = (stage_level + 2.) / 2 if stage_level >= 0. else 2. / \
-        (np.abs(stage_level) + 2.)
-    damage = type_rate * \
-        stab * weather * stage * move_power
-    return damage
-
 def canAttackFirst(my_team:PkmTeam, opp_team:PkmTeam, opp_active:Pkm) -> int:
     
     speed0 = my_team.stage[PkmStat.SPEED]
@@ -191,16 +78,16 @@ def calculateDamages(attack1:int, defense2:int, pkm1:Pkm, pkm2:Pkm, weather:Weat
   moves.sort(reverse=True, key=lambda x : (x[3], x[1], x[2]))
   return moves
 
-class MixedPolicy(BattlePolicy):
+# la ricerca alpha-beta (e lo stato di ricerca condiviso) è quella di AlphaBetaPolicy
+class MixedPolicy(AlphaBetaPolicy):
 
-  def __init__(self, max_depth: int = 6, seed: int = 69):
-    self.max_depth = max_depth
-    random.seed(seed)
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    # livello che ha deciso l'ultima azione e quante decisioni ha preso ciascun livello
+    self.last_tier: str = None
+    self.tier_counts: dict = {tier: 0 for tier in TIERS}
 
   def get_action(self, g: GameState) -> int:
-    root: Node = Node()
-    root.gameState = g
-    
     #print('---------------------------------')
     # print('OPPONENT MOVES')
     # for i in range(DEFAULT_N_ACTIONS-2):
@@ -209,14 +96,42 @@ class MixedPolicy(BattlePolicy):
     # print(g.teams[1])
     # print('---------------------------------')
 
-    # se conosco meno di 2 mosse non utilizzo minimax ma una più semplice
-    if known_opp_moves(g.teams[1].active)<2:
-      return self.simple_search(root.gameState)
+    # le mosse rivelate vengono registrate anche nei turni decisi senza ricerca
+    self.belief.observe(g)
+    # prima i casi già decisi, risolti con le regole greedy senza ricerca
+    action, tier = self._fast_action(g)
+    self.last_tier = tier
+    self.tier_counts[tier] += 1
+    if action is not None:
+      self._search = None
+      self._sample_stats = None
+      self._reset_counters()
+      return action
     # altrimenti faccio minimax
-    else:
-      # stimo delle mosse dell'avversario che non conosco
-      estimate_move(root.gameState.teams[1].active)
-      return self._alphaBeta_search(root)
+    return super().get_action(g)
+
+  def _fast_action(self, g: GameState) -> tuple:
+    # livelli in ordine di costo: (azione, livello), con azione None se serve la ricerca
+    team0 = g.teams[0]
+    team1 = g.teams[1]
+    # una sola azione legale (es. attivo esausto con un solo cambio possibile)
+    actions = legal_actions(team0)
+    if len(actions) == 1:
+      return actions[0], 'forced'
+    # KO sicuro: attacco per primo e ho una mossa che non può mancare e lo sconfigge
+    if team0.active.hp > 0 and canAttackFirst(team0, team1, team1.active) == 1:
+      moves = canDefeat(team0.stage[PkmStat.ATTACK], team1.stage[PkmStat.DEFENSE], team0.active, team1.active, g.weather.condition)
+      if len(moves) > 0 and moves[0][3] >= 1. and team0.active.moves[moves[0][0]].pp > 0:
+        return moves[0][0], 'decided'
+    # se conosco meno di 2 mosse non utilizzo minimax ma una più semplice
+    if known_opp_moves(team1.active)<2:
+      return self.simple_search(g), 'greedy'
+    return None, 'search'
+
+  def search_stats(self) -> dict:
+    stats = super().search_stats()
+    stats['tier'] = self.last_tier
+    return stats
 
   def simple_search(self, g: GameState) -> int:
 
@@ -316,71 +231,3 @@ class MixedPolicy(BattlePolicy):
           return 5
         else:
           return 4
-
-  def _alphaBeta_search(
-      self,
-      root: Node,
-      alpha: float = -np.inf,
-      beta: float = np.inf
-  ) -> int:
-    #print("ALPHA BETA SEARCH")
-    value, move = self._max_value(root, alpha, beta)
-    #print('---------------------------------')
-    #print(f'AlphaBetaPolicy chose action: {root.gameState.teams[0].active.moves[move]}, with value: {value}')
-    #print('---------------------------------')
-    return move
-
-  def _max_value(
-      self,
-      node: Node,
-      alpha: float,
-      beta: float
-  ) -> tuple[float, Union[int, None]]:
-    state: GameState = deepcopy(node.gameState)
-    # print('---------------------------------')
-    # print(f'CURRENT NODE: {str(node)}')
-    # print('---------------------------------')
-    # print(f'MY HP: {state.teams[1].active.hp}')
-    # print(f'OPPONENT HP: {state.teams[1].active.hp}')
-    if state.teams[1].active.hp == 0 or state.teams[0].active.hp == 0 or node.depth >= self.max_depth:
-      return game_state_eval(state, node.depth), None
-    value = -np.inf
-    for i in range(DEFAULT_N_ACTIONS):
-      next_node: Node = Node()
-      next_node.parent = node
-      next_node.depth = node.depth + 1
-      next_node.action = i
-      next_node.gameState = state
-      next_node.value, _ = self._min_value(next_node, alpha, beta)
-      # print('---------------------------------')
-      # print(f'NEXT NODE: {str(next_node)}')
-      # print('---------------------------------')
-      if next_node.value > value:
-        value, move = next_node.value, next_node.action
-        alpha = max(value, alpha)
-      if value >= beta:
-        return value, move
-    return value, move
-        
-  def _min_value(
-      self,
-      node: Node,
-      alpha: float,
-      beta: float
-  ) -> tuple[float, Union[int, None]]:
-    state: GameState = deepcopy(node.gameState)
-    value = np.inf
-    for i in range(DEFAULT_N_ACTIONS):
-      next_state, _, _, _, _ = state.step([node.action, i])
-      next_node: Node = Node()
-      next_node.parent = node
-      next_node.depth = node.depth + 1
-      next_node.action = i
-      next_node.gameState = next_state[0]
-      next_node.value, _ = self._max_value(next_node, alpha, beta)
-      if next_node.value < value:
-        value, move = next_node.value, next_node.action
-        beta = min(value, beta)
-      if value <= alpha:
-        return value, move
-    return value, move
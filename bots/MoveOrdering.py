@@ -0,0 +1,55 @@
+from typing import Dict, List
+
+from vgc.datatypes.Types import PkmStat
+from vgc.datatypes.Objects import GameState
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.PkmTables import calculate_damage
+
+KILLER_BONUS = 1e6
+N_KILLERS = 2
+
+class MoveOrderer():
+  # Ordina le azioni di un nodo prima che alpha-beta le espanda: prima le mosse killer della
+  # stessa profondità, poi il punteggio history dell'azione, poi la stima veloce del danno di
+  # calculate_damage (con un bonus per le mosse che mandano KO l'attivo avversario, come in
+  # canDefeat). I cambi non hanno una stima del danno e vengono dopo le mosse che fanno danno.
+
+  def __init__(self):
+    self.killers: Dict[int, List[int]] = {}
+    # history[0] per le nostre azioni (nodi max), history[1] per le risposte (nodi min)
+    self.history: List[List[float]] = [[0.] * DEFAULT_N_ACTIONS, [0.] * DEFAULT_N_ACTIONS]
+
+  def new_turn(self) -> None:
+    # i killer dipendono dalla profondità della radice, la storia viene solo dimezzata
+    self.killers = {}
+    for side in self.history:
+      for i in range(DEFAULT_N_ACTIONS):
+        side[i] /= 2
+
+  def static_scores(self, g: GameState, side: int) -> List[float]:
+    attacker = g.teams[side]
+    defender = g.teams[1-side]
+    pkm = attacker.active
+    opp = defender.active
+    weather = g.weather.condition
+    scores = [0.] * DEFAULT_N_ACTIONS
+    for i, move in enumerate(pkm.moves):
+      damage = calculate_damage(move, pkm.type, opp.type, attacker.stage[PkmStat.ATTACK], defender.stage[PkmStat.DEFENSE], weather)
+      scores[i] = damage*move.acc
+      if damage >= opp.hp > 0:
+        scores[i] += 1000.*move.acc + 100.*move.priority
+    return scores
+
+  def order(self, g: GameState, depth: int, side: int, actions: List[int]) -> List[int]:
+    killers = self.killers.get(depth, [])
+    history = self.history[side]
+    scores = self.static_scores(g, side)
+    return sorted(actions, reverse=True, key=lambda a: (a in killers)*KILLER_BONUS + history[a] + scores[a])
+
+  def cutoff(self, depth: int, side: int, action: int, remaining: int) -> None:
+    killers = self.killers.setdefault(depth, [])
+    if action not in killers:
+      killers.insert(0, action)
+      del killers[N_KILLERS:]
+    self.history[side][action] += remaining*remaining
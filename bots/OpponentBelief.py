@@ -0,0 +1,181 @@
+from copy import copy, deepcopy
+from itertools import permutations
+from typing import Dict, List, Optional, Tuple
+
+import random
+
+from vgc.datatypes.Objects import GameState, Pkm, PkmMove, PkmTeam
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+from vgc.competition.StandardPkmMoves import STANDARD_MOVE_ROSTER
+
+# Credenza sulle mosse nascoste dell'avversario, una per battaglia. Ogni pokemon avversario
+# ha una distribuzione sulle mosse del roster, indicizzato per tipo e potenza: le mosse si
+# generano come un attacco del tipo del pokemon più mosse qualsiasi del roster, quindi uno
+# slot nascosto è una miscela tra gli attacchi del suo tipo (finché non ne è noto uno) e il
+# roster intero. Le mosse rivelate hanno peso zero, per cui il supporto si restringe soltanto.
+# Le stime vengono scritte solo su copie dello stato, mai sul GameState reale.
+
+N_MOVES = DEFAULT_N_ACTIONS - 2
+
+class RosterIndex():
+
+  def __init__(self, roster: List[PkmMove]):
+    self.moves: Tuple[PkmMove, ...] = tuple(roster)
+    self.position: Dict[str, int] = {move.name: i for i, move in enumerate(self.moves)}
+    # (tipo, potenza) -> posizioni nel roster
+    cells = {}
+    for i, move in enumerate(self.moves):
+      cells.setdefault((int(move.type), move.power), []).append(i)
+    self.cells: Dict[Tuple[int, float], Tuple[int, ...]] = {cell: tuple(ids) for cell, ids in cells.items()}
+    # attacchi di ogni tipo, per potenza decrescente
+    attacks = {}
+    for (move_type, power), ids in sorted(self.cells.items(), key=lambda item: -item[0][1]):
+      if power > 0.0:
+        attacks.setdefault(move_type, []).extend(ids)
+    self.attacks: Dict[int, Tuple[int, ...]] = {t: tuple(ids) for t, ids in attacks.items()}
+
+# indice del roster, costruito una volta per processo al primo uso
+_roster_index: RosterIndex = None
+
+def roster_index() -> RosterIndex:
+  global _roster_index
+  if _roster_index is None:
+    _roster_index = RosterIndex(STANDARD_MOVE_ROSTER)
+  return _roster_index
+
+def team_pkms(team: PkmTeam) -> List[Pkm]:
+  return [team.active] + list(team.party)
+
+class PkmBelief():
+
+  def __init__(self, pkm: Pkm):
+    index = roster_index()
+    self.type = int(pkm.type)
+    self.max_hp = pkm.max_hp
+    self.hp = pkm.hp
+    self.revealed: Dict[str, PkmMove] = {}
+    # pesi delle due componenti, per posizione nel roster: il roster intero e gli attacchi del tipo
+    self.roster_weights = [1.] * len(index.moves)
+    stab = index.attacks.get(self.type, ())
+    self.stab_weights = [0.] * len(index.moves)
+    for i in stab:
+      self.stab_weights[i] = 1.
+    self.stab_known = len(stab) == 0
+
+  def reveal(self, move: PkmMove) -> None:
+    self.revealed[move.name] = move
+    i = roster_index().position.get(move.name)
+    if i is not None:
+      self.roster_weights[i] = 0.
+      self.stab_weights[i] = 0.
+    if move.type == self.type and move.power > 0.0:
+      self.stab_known = True
+
+  def weights(self, exclude: List[int], hidden: int, need_type: bool) -> List[float]:
+    # distribuzione di uno slot nascosto dati gli slot ancora da stimare: se manca un attacco
+    # del tipo, uno di questi slot lo è, e all'ultimo slot lo è di sicuro
+    stab_share = 1. / hidden if need_type and sum(self.stab_weights) > 0. else 0.
+    stab_total = sum(self.stab_weights) or 1.
+    roster_total = sum(self.roster_weights) or 1.
+    weights = [stab_share * s / stab_total + (1. - stab_share) * r / roster_total
+               for s, r in zip(self.stab_weights, self.roster_weights)]
+    for i in exclude:
+      weights[i] = 0.
+    return weights
+
+class OpponentBelief():
+
+  def __init__(self):
+    # credenza per pokemon avversario, e per ogni posizione della vista corrente (attivo,
+    # party) il pokemon che la occupa
+    self.pkms: List[PkmBelief] = []
+    self.slots: List[int] = []
+
+  def _match(self, view: List[Pkm]) -> Optional[Tuple[int, ...]]:
+    # nella vista dell'avversario i pokemon sono copie nuove a ogni turno: li riconosco dalla
+    # permutazione dei turni precedenti (i cambi scambiano l'attivo con il party) coerente con
+    # tipo, hp massimi, hp che non crescono e mosse rivelate; tipo e hp massimi possono
+    # coincidere tra due pokemon, l'ordine no
+    best, best_cost = None, None
+    for slots in permutations(self.slots):
+      cost = sum(slot != old for slot, old in zip(slots, self.slots))
+      for pkm, slot in zip(view, slots):
+        belief = self.pkms[slot]
+        if int(pkm.type) != belief.type or pkm.max_hp != belief.max_hp:
+          break
+        if pkm.hp > belief.hp:
+          cost += 10
+        for move in pkm.moves:
+          if move.name is not None and move.name not in belief.revealed and any(
+              move.name in other.revealed for other in self.pkms if other is not belief):
+            cost += 10
+      else:
+        if best_cost is None or cost < best_cost:
+          best, best_cost = slots, cost
+    return best
+
+  def observe(self, g: GameState) -> None:
+    # aggiorna le mosse rivelate di tutti i pokemon avversari visibili
+    view = team_pkms(g.teams[1])
+    slots = self._match(view) if len(self.slots) == len(view) else None
+    if slots is None:
+      self.pkms = [PkmBelief(pkm) for pkm in view]
+      slots = tuple(range(len(view)))
+    self.slots = list(slots)
+    for pkm, slot in zip(view, slots):
+      belief = self.pkms[slot]
+      belief.hp = pkm.hp
+      for move in pkm.moves:
+        if move.name is not None and move.name not in belief.revealed:
+          belief.reveal(move)
+
+  def pkm_belief(self, pkm: Pkm, position: int) -> PkmBelief:
+    # pkm è nella posizione position (0 l'attivo, poi il party) di una copia dell'ultima vista
+    if position < len(self.slots):
+      belief = self.pkms[self.slots[position]]
+      if belief.type == int(pkm.type) and belief.max_hp == pkm.max_hp:
+        return belief
+    return PkmBelief(pkm)
+
+  def known_moves(self, pkm: Pkm, position: int = 0) -> List[PkmMove]:
+    return list(self.pkm_belief(pkm, position).revealed.values())
+
+  def fill(self, pkm: Pkm, rng: random.Random = random, position: int = 0) -> None:
+    # scrive una stima delle mosse nascoste di pkm; pkm deve essere una copia
+    belief = self.pkm_belief(pkm, position)
+    index = roster_index()
+    names = {move.name for move in pkm.moves if move.name is not None}
+    # le mosse rivelate in turni precedenti ma nascoste in questa vista tornano al loro posto
+    recalled = [move for name, move in belief.revealed.items() if name not in names]
+    names.update(belief.revealed)
+    need_type = not belief.stab_known and not any(
+        move.type == pkm.type and move.power > 0.0 for move in pkm.moves if move.name is not None)
+    hidden = [move_i for move_i in range(N_MOVES) if pkm.moves[move_i].name is None]
+    exclude = [index.position[name] for name in names if name in index.position]
+    for n, move_i in enumerate(hidden):
+      if len(recalled) > 0:
+        move = recalled.pop()
+      else:
+        # estrazione senza ripetizioni dalla distribuzione del pokemon
+        weights = belief.weights(exclude, len(hidden) - n, need_type)
+        i = rng.choices(range(len(weights)), weights)[0]
+        exclude.append(i)
+        move = index.moves[i]
+      if move.type == pkm.type and move.power > 0.0:
+        need_type = False
+      # copia: la ricerca consuma i pp delle mosse e il roster è condiviso
+      pkm.moves[move_i] = copy(move)
+
+  def fill_team(self, team: PkmTeam, rng: random.Random = random, active_only: bool = True) -> None:
+    for position, pkm in enumerate([team.active] if active_only else team_pkms(team)):
+      self.fill(pkm, rng, position)
+
+  def samples(self, g: GameState, k: int, rng: random.Random = random, active_only: bool = True) -> List[GameState]:
+    # k determinizzazioni indipendenti dello stato, ognuna su una propria copia
+    self.observe(g)
+    states = []
+    for _ in range(k):
+      state = deepcopy(g)
+      self.fill_team(state.teams[1], rng, active_only)
+      states.append(state)
+    return states
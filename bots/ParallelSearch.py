@@ -0,0 +1,187 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Union
+
+import math
+import multiprocessing
+import time
+
+from vgc.datatypes.Objects import GameState
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+# Divisione della radice tra processi (young brothers wait): la prima azione della
+# radice, la più promettente secondo l'ordinamento, viene cercata nel processo
+# principale per avere un alpha; le altre vengono cercate in parallelo dai worker,
+# che leggono l'alpha condiviso a ogni nodo min e lo vedono salire man mano che
+# arrivano i risultati.
+
+_worker_policy = None
+
+def _init_worker(options: dict, shared_alpha) -> None:
+  global _worker_policy
+  from bots.AlphaBetaPolicy import AlphaBetaPolicy
+  _worker_policy = AlphaBetaPolicy(**options)
+  _worker_policy._shared_alpha = shared_alpha
+
+_worker_search_id = None
+
+def _search_action(g: GameState, action: int, alpha: float, beta: float, depth_limit: int,
+    time_left: Union[float, None], search_id: int, replay_replies: bool) -> tuple:
+  from bots.AlphaBetaPolicy import Node, SearchTimeout
+  from bots.SearchState import SearchState
+  global _worker_search_id
+  policy = _worker_policy
+  if search_id != _worker_search_id:
+    # nuova radice: le voci della TT del worker vengono da un'altra partita o da un alpha
+    # condiviso diverso, si riparte da zero (le azioni della stessa radice la condividono)
+    _worker_search_id = search_id
+    if policy.tt is not None:
+      policy.tt.clear()
+  policy._search = SearchState(g)
+  node = Node()
+  node.gameState = policy._search.root
+  policy._init_root(node)
+  node.depth = 1
+  node.action = action
+  policy._depth_limit = depth_limit
+  policy._deadline = None if time_left is None else time.perf_counter() + time_left
+  policy._replay_replies = replay_replies
+  policy._pv = []
+  policy._pv_table = {}
+  try:
+    value, _ = policy._min_value(node, alpha, beta)
+  except SearchTimeout:
+    return action, None, False, policy.search_stats()
+  # la ricerca ha potato con l'alpha condiviso, che può essere salito durante la visita:
+  # un valore che non lo supera è solo un limite superiore (fail low)
+  fail_low = value <= max(alpha, policy._shared_alpha.value)
+  return action, value, fail_low, policy.search_stats()
+
+def _search_sample(g: GameState, time_budget: Union[float, None], deadline: Union[float, None], seed: int) -> tuple:
+  from bots.Seeding import seed_global
+  policy = _worker_policy
+  if deadline is not None:
+    # un campione partito tardi (in un'ondata successiva) ha solo il tempo rimasto fino alla scadenza comune
+    time_budget = max(min(time_budget, deadline - time.time()), 0.)
+  # un seed per campione, preso dal generatore della policy, per i passi del motore
+  # (generatori globali) e per la policy del worker (TT e killer ripartono da zero):
+  # il risultato non dipende da quale worker cerca il campione
+  seed_global(seed)
+  policy.reseed(seed)
+  values = policy._sample_values(g, time_budget)
+  return values, policy.search_stats()
+
+class SampleSearcher():
+  # Ricerca dei campioni di una get_action con n_samples > 1: ogni stato determinizzato
+  # viene cercato per intero da un worker del pool, che restituisce i valori delle azioni
+  # della radice. I processi evitano il GIL, che con dei thread serializzerebbe la ricerca.
+
+  def __init__(self, n_workers: int, options: dict):
+    self.n_workers = n_workers
+    self.options = options
+    self._pool: ProcessPoolExecutor = None
+
+  def __getstate__(self):
+    state = self.__dict__.copy()
+    state['_pool'] = None
+    return state
+
+  def available(self) -> bool:
+    return not multiprocessing.current_process().daemon
+
+  def search(self, policy, states: list) -> tuple:
+    if self._pool is None:
+      self._pool = ProcessPoolExecutor(self.n_workers, initializer=_init_worker, initargs=(self.options, None))
+    time_budget, deadline = None, None
+    if policy.time_budget is not None:
+      # con più campioni che worker i campioni vengono cercati a ondate: ogni campione ha una
+      # frazione del tempo, e tutti si fermano alla stessa scadenza (time.time è comune ai processi)
+      waves = math.ceil(len(states) / self.n_workers)
+      time_budget = policy.time_budget / waves
+      deadline = time.time() + policy.time_budget
+    futures = [self._pool.submit(_search_sample, g, time_budget, deadline, policy.rng.getrandbits(32)) for g in states]
+    results = [future.result() for future in futures]
+    return [values for values, _ in results], [stats for _, stats in results]
+
+  def close(self) -> None:
+    if self._pool is not None:
+      self._pool.shutdown(cancel_futures=True)
+      self._pool = None
+
+class RootSplitter():
+
+  def __init__(self, n_workers: int, min_depth: int, options: dict):
+    self.n_workers = n_workers
+    self.min_depth = min_depth
+    self.options = options
+    self._pool: ProcessPoolExecutor = None
+    self._alpha = None
+    self._n_searches: int = 0
+
+  def __getstate__(self):
+    # il pool non si può serializzare: una copia della policy ne crea uno nuovo al primo uso
+    state = self.__dict__.copy()
+    state['_pool'] = None
+    state['_alpha'] = None
+    return state
+
+  def available(self, depth_limit: int) -> bool:
+    # sotto min_depth il costo dei processi supera il guadagno; un processo daemon
+    # (es. un worker di multiprocessing.Pool) non può avere figli
+    return (self.n_workers > 1 and depth_limit >= self.min_depth
+            and not multiprocessing.current_process().daemon)
+
+  def _start(self) -> None:
+    self._alpha = multiprocessing.RawValue('d', -math.inf)
+    self._pool = ProcessPoolExecutor(self.n_workers, initializer=_init_worker, initargs=(self.options, self._alpha))
+
+  def search(self, policy, root, alpha: float, beta: float) -> tuple:
+    from bots.AlphaBetaPolicy import Node, SearchTimeout
+    if self._pool is None:
+      self._start()
+    actions = policy._order(root, list(range(DEFAULT_N_ACTIONS)), 0)
+    # fratello maggiore nel processo principale
+    eldest: Node = Node()
+    eldest.depth = 1
+    eldest.action = actions[0]
+    eldest.gameState = root.gameState
+    eldest.features = root.features
+    eldest.key = root.key
+    eldest.terms = root.terms
+    eldest.on_pv = policy._child_on_pv(root, actions[0])
+    value, _ = policy._min_value(eldest, alpha, beta)
+    move = actions[0]
+    self._alpha.value = max(alpha, value)
+    time_left = None if policy._deadline is None else policy._deadline - time.perf_counter()
+    self._n_searches += 1
+    futures = [self._pool.submit(_search_action, root.gameState, action, self._alpha.value, beta,
+                                 policy._depth_limit, time_left, self._n_searches, policy._replay_replies)
+               for action in actions[1:]]
+    values = {}
+    for future in as_completed(futures):
+      action, action_value, fail_low, stats = future.result()
+      if action_value is None:
+        for f in futures:
+          f.cancel()
+        raise SearchTimeout()
+      values[action] = (action_value, fail_low)
+      policy.n_nodes += stats['nodes']
+      policy.n_leaves += stats['leaves']
+      policy.n_cutoffs += stats['cutoffs']
+      policy.max_ply = max(policy.max_ply, stats['depth'])
+      policy._search.n_copies += stats['copies']
+      policy._search.n_steps += stats['steps']
+      if not fail_low and action_value > self._alpha.value:
+        self._alpha.value = action_value
+    # i risultati vengono letti nell'ordine seriale, così i pareggi si risolvono come nella ricerca
+    # seriale; un fail low non è un valore esatto e non sceglie la mossa, nemmeno a pari valore
+    for action in actions[1:]:
+      action_value, fail_low = values[action]
+      if not fail_low and action_value > value:
+        value, move = action_value, action
+    policy._pv_table[0] = [move]
+    return value, move
+
+  def close(self) -> None:
+    if self._pool is not None:
+      self._pool.shutdown(cancel_futures=True)
+      self._pool = None
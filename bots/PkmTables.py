@@ -0,0 +1,95 @@
+from typing import List
+
+import numpy as np
+
+from vgc.datatypes.Types import PkmStat, PkmType, WeatherCondition
+from vgc.datatypes.Objects import GameState, PkmMove
+from vgc.datatypes.Constants import TYPE_CHART_MULTIPLIER
+
+# Tabelle condivise da tutte le policy, costruite una volta sola all'import.
+# Le versioni a tuple servono alle funzioni scalari (l'accesso è più veloce che su numpy),
+# TYPE_CHART serve ai valutatori vettoriali.
+
+N_TYPES = len(PkmType)
+N_WEATHERS = len(WeatherCondition)
+STAB = 1.5
+
+TYPE_CHART = np.array(TYPE_CHART_MULTIPLIER, dtype=np.float64)
+TYPE_RATE = tuple(tuple(float(TYPE_CHART_MULTIPLIER[m][t]) for t in range(N_TYPES)) for m in range(N_TYPES))
+
+# DEFENSIVE_MATCH_UP[my_type][opp_type][move_type]: quanto una mossa dell'avversario ci colpisce
+DEFENSIVE_MATCH_UP = tuple(tuple(tuple(
+    TYPE_RATE[m][my]*STAB if m == opp else TYPE_RATE[m][my]
+    for m in range(N_TYPES)) for opp in range(N_TYPES)) for my in range(N_TYPES))
+
+# OFFENSIVE_MATCH_UP[my_type][opp_type][move_type]: stessa regola di match_up_eval per le nostre mosse
+OFFENSIVE_MATCH_UP = tuple(tuple(tuple(
+    TYPE_RATE[m][opp]*STAB if m == opp else TYPE_RATE[m][my]
+    for m in range(N_TYPES)) for opp in range(N_TYPES)) for my in range(N_TYPES))
+
+# WEATHER_RATE[weather][move_type]
+def _weather_rate(weather: WeatherCondition, move_type: PkmType) -> float:
+  if (move_type == PkmType.WATER and weather == WeatherCondition.RAIN) or (
+          move_type == PkmType.FIRE and weather == WeatherCondition.SUNNY):
+    return 1.5
+  elif (move_type == PkmType.WATER and weather == WeatherCondition.SUNNY) or (
+          move_type == PkmType.FIRE and weather == WeatherCondition.RAIN):
+    return .5
+  return 1.
+
+WEATHER_RATE = tuple(tuple(_weather_rate(WeatherCondition(w), PkmType(m)) for m in range(N_TYPES)) for w in range(N_WEATHERS))
+
+# STAGE_RATE[stage_level + MAX_STAGE_LEVEL], stage_level = attack_stage - defense_stage
+MAX_STAGE_LEVEL = 12
+
+def stage_rate(stage_level: int) -> float:
+  return (stage_level + 2.) / 2 if stage_level >= 0. else 2. / (abs(stage_level) + 2.)
+
+STAGE_RATE = tuple(stage_rate(level) for level in range(-MAX_STAGE_LEVEL, MAX_STAGE_LEVEL + 1))
+
+def match_up_eval(my_pkm_type: PkmType,
+      opp_pkm_type: PkmType,
+      my_moves_type: List[PkmType],
+      opp_moves_type: List[PkmType]
+  ) -> float:
+  defensive = DEFENSIVE_MATCH_UP[my_pkm_type][opp_pkm_type]
+  offensive = OFFENSIVE_MATCH_UP[my_pkm_type][opp_pkm_type]
+  offensive_match_up = 0.
+  for mtype in my_moves_type:
+    if offensive[mtype] > offensive_match_up:
+      offensive_match_up = offensive[mtype]
+  defensive_match_up = 0.
+  for mtype in opp_moves_type:
+    if defensive[mtype] > defensive_match_up:
+      defensive_match_up = defensive[mtype]
+  return offensive_match_up - defensive_match_up
+
+def calculate_damage(move: PkmMove, pkm_type: PkmType, opp_pkm_type: PkmType, attack_stage: int, defense_stage: int, weather: WeatherCondition) -> float:
+  if move.pp <= 0 or move.name is None:
+    return 0
+  type_rate = TYPE_RATE[move.type][opp_pkm_type]
+  if type_rate == 0:
+    return 0
+  if move.fixed_damage > 0:
+    return move.fixed_damage
+  stab = STAB if move.type == pkm_type else 1.
+  stage_level = attack_stage - defense_stage
+  if -MAX_STAGE_LEVEL <= stage_level <= MAX_STAGE_LEVEL:
+    stage = STAGE_RATE[stage_level + MAX_STAGE_LEVEL]
+  else:
+    stage = stage_rate(stage_level)
+  return type_rate * stab * WEATHER_RATE[weather][move.type] * stage * move.power
+
+def damage_matrix(g: GameState) -> List[List[float]]:
+  # danni per turno tra i due attivi: riga 0 le nostre mosse sull'avversario, riga 1 le sue su di noi
+  weather = g.weather.condition
+  matrix = []
+  for side in range(2):
+    attacker = g.teams[side]
+    defender = g.teams[1-side]
+    pkm = attacker.active
+    opp_type = defender.active.type
+    attack = attacker.stage[PkmStat.ATTACK]
+    defense = defender.stage[PkmStat.DEFENSE]
+    matrix.append([calculate_damage(move, pkm.type, opp_type, attack, defense, weather) for move in pkm.moves])
+  return matrix
@@ -0,0 +1,112 @@
+from typing import Dict, List, Tuple
+
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from vgc.behaviour import BattlePolicy
+from vgc.datatypes.Objects import GameState
+
+# Profiling delle policy: ProfiledPolicy misura la durata di ogni get_action e, se la
+# policy ha search_stats(), il lavoro fatto (nodi, foglie, deepcopy, step, tagli,
+# profondità raggiunta). Se il profiling è spento le policy non vengono avvolte,
+# quindi il costo è nullo; i contatori della ricerca esistono comunque.
+# Le policy a livelli (MixedPolicy) riportano anche in search_stats()['tier'] quale livello
+# ha deciso: il report conta le decisioni per livello e stima il tempo di ricerca risparmiato
+# da quelle prese senza ricerca, alla durata media delle decisioni cercate.
+
+STAT_NAMES = ('nodes', 'leaves', 'copies', 'steps', 'cutoffs', 'depth')
+
+class ProfiledPolicy(BattlePolicy):
+
+  def __init__(self, policy: BattlePolicy, profiler, name: str):
+    self.policy = policy
+    self.profiler = profiler
+    self.name = name
+    self.depth = getattr(policy, 'max_depth', 0)
+
+  def get_action(self, g: GameState) -> int:
+    start = time.perf_counter()
+    action = self.policy.get_action(g)
+    elapsed = time.perf_counter() - start
+    stats = self.policy.search_stats() if hasattr(self.policy, 'search_stats') else None
+    self.profiler.add(self.name, self.depth, elapsed, stats)
+    return action
+
+  def close(self):
+    self.policy.close()
+
+class Profiler():
+  # un campione per get_action: (durata, contatori...), raggruppati per policy e profondità
+
+  def __init__(self):
+    self.samples: Dict[Tuple[str, int], List[tuple]] = {}
+
+  def wrap(self, policy: BattlePolicy, name: str) -> ProfiledPolicy:
+    return ProfiledPolicy(policy, self, name)
+
+  def add(self, name: str, depth: int, elapsed: float, stats: dict = None) -> None:
+    # l'ultimo elemento del campione è il livello che ha deciso, None se la policy non ne ha
+    if stats is None:
+      sample = (elapsed,) + (math.nan,) * len(STAT_NAMES) + (None,)
+    else:
+      sample = (elapsed,) + tuple(stats[s] for s in STAT_NAMES) + (stats.get('tier'),)
+    self.samples.setdefault((name, depth), []).append(sample)
+
+  def take(self) -> Dict[Tuple[str, int], List[tuple]]:
+    # campioni raccolti finora (es. in un worker), da unire con merge nel processo principale
+    samples = self.samples
+    self.samples = {}
+    return samples
+
+  def merge(self, samples: Dict[Tuple[str, int], List[tuple]]) -> None:
+    for key, values in samples.items():
+      self.samples.setdefault(key, []).extend(values)
+
+  def report(self) -> pd.DataFrame:
+    rows = []
+    for (name, depth), values in sorted(self.samples.items()):
+      data = np.array([v[:-1] for v in values], dtype=np.float64)
+      elapsed = data[:, 0]
+      p50, p95, p99 = np.percentile(elapsed, [50, 95, 99]) * 1000
+      row = {'policy': name, 'depth': depth, 'moves': len(values),
+             'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99, 'mean_ms': elapsed.mean() * 1000}
+      for i, stat in enumerate(STAT_NAMES):
+        column = data[:, i + 1]
+        if stat == 'depth':
+          row['max_depth_reached'] = np.nan if np.isnan(column).all() else np.nanmax(column)
+        else:
+          row[f'mean_{stat}'] = np.nan if np.isnan(column).all() else np.nanmean(column)
+      nodes = data[:, 1]
+      row['nodes_per_sec'] = np.nan if np.isnan(nodes).all() else np.nansum(nodes) / elapsed.sum()
+      tiers = [v[-1] for v in values]
+      if any(tier is not None for tier in tiers):
+        for tier in sorted(set(tiers) - {None}):
+          row[f'tier_{tier}'] = tiers.count(tier)
+        row['saved_s'] = self._saved(elapsed, tiers)
+      rows.append(row)
+    return pd.DataFrame(rows)
+
+  @staticmethod
+  def _saved(elapsed: np.ndarray, tiers: List[str]) -> float:
+    # tempo risparmiato: decisioni dei livelli forced e decided moltiplicate per la durata media di
+    # quelle con ricerca, meno il tempo che hanno comunque richiesto; i turni greedy non vengono
+    # contati perché non erano cercati nemmeno prima dei livelli
+    searched = np.array([tier == 'search' for tier in tiers])
+    fast = np.array([tier in ('forced', 'decided') for tier in tiers])
+    if not searched.any():
+      return math.nan
+    return fast.sum() * elapsed[searched].mean() - elapsed[fast].sum()
+
+  def saved_time(self) -> float:
+    # totale stimato su tutte le policy a livelli, in secondi
+    total = 0.
+    for values in self.samples.values():
+      tiers = [v[-1] for v in values]
+      if any(tier is not None for tier in tiers):
+        saved = self._saved(np.array([v[0] for v in values]), tiers)
+        if not math.isnan(saved):
+          total += saved
+    return total
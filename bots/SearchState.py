@@ -0,0 +1,116 @@
+from typing import List
+from copy import deepcopy
+
+from vgc.datatypes.Objects import GameState, PkmTeam, Pkm
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+# Uno snapshot contiene solo i campi che GameState.step può cambiare: hp, status e pp di ogni
+# pokemon, stage e ordine attivo/party delle due squadre, il meteo e gli attributi dello stato
+# stesso (contatori dei turni, riferimenti a squadre e meteo). Ripristinarlo annulla uno step
+# in place. I pokemon della copia non cambiano mai identità, per cui uno snapshot è una lista
+# piatta di valori in ordine fisso (attivo e party sono salvati come posizioni nella lista dei
+# pokemon della squadra) invece di tuple e liste annidate: due allocazioni per push invece di
+# circa venticinque.
+
+def legal_actions(team: PkmTeam) -> List[int]:
+  # mosse con pp rimasti e cambi verso pokemon non esausti, le altre azioni non cambiano
+  # niente; con l'attivo esausto restano solo i cambi
+  switches = [DEFAULT_N_ACTIONS-2 + i for i, pkm in enumerate(team.party) if pkm.hp > 0]
+  if team.active.hp == 0 and len(switches) > 0:
+    return switches
+  actions = [i for i, move in enumerate(team.active.moves) if move.pp > 0]
+  if len(actions) == 0:
+    actions = list(range(DEFAULT_N_ACTIONS-2))
+  return actions + switches
+
+def team_pkms(team: PkmTeam) -> List[Pkm]:
+  return [team.active] + list(team.party)
+
+def position(pkm: Pkm, pkms: List[Pkm]) -> int:
+  # per identità: i pokemon della copia sono sempre gli stessi oggetti
+  for i, other in enumerate(pkms):
+    if other is pkm:
+      return i
+  raise ValueError('pkm not in team')
+
+def snapshot(g: GameState, pkms: List[List[Pkm]]) -> list:
+  weather = g.weather
+  values = [dict(g.__dict__), weather, weather.condition, weather.n_turns_no_clear]
+  for team, members in zip(g.teams, pkms):
+    values.append(position(team.active, members))
+    for pkm in team.party:
+      values.append(position(pkm, members))
+    values.append(team.confused)
+    values.append(team.n_turns_confused)
+    values.extend(team.stage)
+    values.extend(team.entry_hazard)
+    for pkm in members:
+      values.append(pkm.hp)
+      values.append(pkm.status)
+      values.append(pkm.n_turns_asleep)
+      for move in pkm.moves:
+        values.append(move.pp)
+  return values
+
+def restore(g: GameState, pkms: List[List[Pkm]], values: list) -> None:
+  g.__dict__.update(values[0])
+  weather = values[1]
+  weather.condition = values[2]
+  weather.n_turns_no_clear = values[3]
+  i = 4
+  for team, members in zip(g.teams, pkms):
+    team.active = members[values[i]]
+    i += 1
+    party = team.party
+    for j in range(len(party)):
+      party[j] = members[values[i]]
+      i += 1
+    team.confused = values[i]
+    team.n_turns_confused = values[i+1]
+    i += 2
+    n = len(team.stage)
+    team.stage[:] = values[i:i+n]
+    i += n
+    n = len(team.entry_hazard)
+    team.entry_hazard[:] = values[i:i+n]
+    i += n
+    for pkm in members:
+      pkm.hp = values[i]
+      pkm.status = values[i+1]
+      pkm.n_turns_asleep = values[i+2]
+      i += 3
+      for move in pkm.moves:
+        move.pp = values[i]
+        i += 1
+
+class SearchState():
+  # Make/unmake comune alle ricerche alpha-beta: lo stato reale viene copiato una volta per
+  # get_action, poi ogni nodo applica le coppie di azioni in place con step() e le annulla
+  # tornando indietro con pop(). Ogni snapshot viene ripristinato nello stato su cui è stato
+  # fatto il push, che è la copia della radice a meno che GameState.step non restituisca
+  # un nuovo stato.
+
+  def __init__(self, g: GameState):
+    self.root: GameState = deepcopy(g)
+    # pokemon della copia in ordine fisso (attivo, party) per ogni squadra
+    self._pkms: List[List[Pkm]] = [team_pkms(team) for team in self.root.teams]
+    self._trail: List[list] = []
+    # contatori per il profiling: copie complete dello stato e chiamate a GameState.step
+    self.n_copies: int = 1
+    self.n_steps: int = 0
+
+  def push(self, g: GameState) -> None:
+    pkms = self._pkms if g is self.root else [team_pkms(team) for team in g.teams]
+    self._trail.append((g, pkms, snapshot(g, pkms)))
+
+  def pop(self) -> None:
+    g, pkms, values = self._trail.pop()
+    restore(g, pkms, values)
+
+  def step(self, g: GameState, actions: List[int]) -> GameState:
+    next_state, _, _, _, _ = g.step(actions)
+    self.n_steps += 1
+    return next_state[0]
+
+  def depth(self) -> int:
+    return len(self._trail)
@@ -0,0 +1,23 @@
+from typing import List
+
+import numpy as np
+import random
+
+# Ogni battaglia ha un proprio seed, ricavato dal seed principale e dall'indice della
+# battaglia: una battaglia di un torneo si può rigiocare da sola, e le esecuzioni
+# seriali e parallele danno gli stessi risultati qualunque sia il processo che la gioca.
+
+def battle_seed(master_seed: int, battle_index: int) -> int:
+  return int(np.random.SeedSequence([master_seed, battle_index]).generate_state(1)[0])
+
+def seed_global(seed: int) -> None:
+  # il motore e i generatori di roster/team usano i generatori globali
+  random.seed(seed)
+  np.random.seed(seed)
+
+def seed_battle(seed: int, policies: List = ()) -> None:
+  seed_global(seed)
+  for side, policy in enumerate(policies):
+    # ogni policy che lo supporta riceve il proprio flusso, diverso per i due lati
+    if hasattr(policy, 'reseed'):
+      policy.reseed(battle_seed(seed, side))
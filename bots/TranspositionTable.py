@@ -0,0 +1,156 @@
+from typing import Dict, List, Tuple, Union
+import random
+
+from vgc.datatypes.Objects import GameState, PkmTeam, Pkm
+
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+# Feature di uno stato che la ricerca sa distinguere, divise in parti: una per pokemon di ogni
+# squadra, per posizione (attivo, poi il party in ordine) con tipo, hp esatti, status, turni di
+# sonno e nome e pp di tutte le mosse; una per squadra con stage, confusione e entry hazard; una
+# per il meteo. Due stati con le stesse feature sono lo stesso nodo.
+# Uno step cambia solo i due attivi (prima e dopo un cambio), le parti delle squadre e il meteo:
+# la chiave viene aggiornata soltanto su queste parti.
+
+def pkm_features(pkm: Pkm) -> tuple:
+  features = (pkm.type, pkm.hp, pkm.status, pkm.n_turns_asleep)
+  for move in pkm.moves:
+    features += (move.name, move.pp)
+  return features
+
+def team_features(team: PkmTeam) -> tuple:
+  return tuple(team.stage) + (team.confused, team.n_turns_confused, tuple(team.entry_hazard))
+
+def team_stride(g: GameState) -> int:
+  # parti di una squadra: i pokemon più la parte della squadra
+  return len(g.teams[0].party) + 2
+
+def feature_part(g: GameState, i: int) -> tuple:
+  stride = team_stride(g)
+  if i == 2*stride:
+    return (g.weather.condition, g.weather.n_turns_no_clear)
+  team = g.teams[i // stride]
+  p = i % stride
+  if p == stride - 1:
+    return team_features(team)
+  return pkm_features(team.active if p == 0 else team.party[p-1])
+
+def state_features(g: GameState) -> tuple:
+  return tuple(feature_part(g, i) for i in range(2*team_stride(g) + 1))
+
+def step_actives(g: GameState) -> list:
+  # attivi prima dello step, per sapere dopo quali posizioni sono cambiate
+  return [team.active for team in g.teams]
+
+def changed_parts(g: GameState, actives: list) -> List[int]:
+  # parti che lo step può aver cambiato: l'attivo, la posizione in cui è finito l'attivo
+  # precedente (dopo un cambio), la parte della squadra e il meteo
+  stride = team_stride(g)
+  parts = []
+  for t, (team, active) in enumerate(zip(g.teams, actives)):
+    base = t*stride
+    parts.append(base)
+    if team.active is not active:
+      positions = [p for p, pkm in enumerate(team.party, 1) if pkm is active]
+      # uno stato nuovo (non modificato in place): tutte le posizioni
+      parts.extend(base + p for p in (positions or range(1, stride - 1)))
+    parts.append(base + stride - 1)
+  parts.append(2*stride)
+  return parts
+
+def update_features(features: tuple, g: GameState, parts: List[int]) -> tuple:
+  features = list(features)
+  for i in parts:
+    features[i] = feature_part(g, i)
+  return tuple(features)
+
+class ZobristHasher():
+  # Una chiave casuale a 64 bit per (parte, valore), estratta al primo uso da un generatore
+  # privato, così lo stato di random globale non viene toccato.
+
+  def __init__(self, seed: int = 0):
+    self._rng = random.Random(seed)
+    self._keys: Dict[Tuple[int, object], int] = {}
+
+  def _key(self, i: int, value) -> int:
+    key = self._keys.get((i, value))
+    if key is None:
+      key = self._keys[(i, value)] = self._rng.getrandbits(64)
+    return key
+
+  def hash(self, features: tuple) -> int:
+    h = 0
+    for i, value in enumerate(features):
+      h ^= self._key(i, value)
+    return h
+
+  def update(self, h: int, old_features: tuple, new_features: tuple, parts: List[int]) -> int:
+    # solo le parti toccate dallo step vengono tolte e rimesse
+    for i in parts:
+      old, new = old_features[i], new_features[i]
+      if old != new:
+        h ^= self._key(i, old) ^ self._key(i, new)
+    return h
+
+class TTEntry():
+
+  def __init__(self, key: int, value: float, depth: int, bound: int, move: Union[int, None], generation: int):
+    self.key = key
+    self.value = value
+    self.depth = depth
+    self.bound = bound
+    self.move = move
+    self.generation = generation
+
+class TranspositionTable():
+  # Tabella di dimensione fissa indicizzata da key % size. Una voce viene sostituita se è di una
+  # get_action precedente o se il nuovo risultato è stato cercato almeno alla stessa profondità,
+  # così i risultati profondi del turno corrente restano.
+
+  def __init__(self, size: int = 2**16):
+    self.size = size
+    self._table: List[Union[TTEntry, None]] = [None] * size
+    self.generation = 0
+    self.hits = 0
+    self.misses = 0
+    self.stores = 0
+    self.history: List[Tuple[int, int]] = []
+
+  def new_turn(self) -> None:
+    if self.generation > 0:
+      self.history.append((self.hits, self.misses))
+    self.generation += 1
+    self.hits = 0
+    self.misses = 0
+    self.stores = 0
+
+  def probe(self, key: int) -> Union[TTEntry, None]:
+    entry = self._table[key % self.size]
+    if entry is not None and entry.key == key:
+      self.hits += 1
+      return entry
+    self.misses += 1
+    return None
+
+  def store(self, key: int, value: float, depth: int, bound: int, move: Union[int, None]) -> None:
+    i = key % self.size
+    entry = self._table[i]
+    if entry is None or entry.key == key or entry.generation != self.generation or depth >= entry.depth:
+      self._table[i] = TTEntry(key, value, depth, bound, move, self.generation)
+      self.stores += 1
+
+  def clear(self) -> None:
+    self._table = [None] * self.size
+    self.history = []
+
+  def stats(self) -> dict:
+    probes = self.hits + self.misses
+    return {
+      'hits': self.hits,
+      'misses': self.misses,
+      'stores': self.stores,
+      'hit_rate': self.hits/probes if probes > 0 else 0.,
+      'filled': sum(entry is not None for entry in self._table)
+    }
@@ -0,0 +1,93 @@
+from copy import deepcopy
+
+import random
+
+import numpy as np
+import pytest
+
+from vgc.datatypes.Constants import DEFAULT_N_ACTIONS
+
+from bots.AlphaBetaPolicy import AlphaBetaPolicy, game_state_eval
+from bots.OpponentBelief import OpponentBelief
+
+from PolicyBenchmark import build_corpus
+
+# La ricerca a profondità fissa (senza time_budget) deve scegliere le stesse azioni della
+# ricerca con una deepcopy per nodo min, su cui sono state aggiunte le ottimizzazioni:
+# qui è riscritta com'era, e le due vengono confrontate sulle posizioni del benchmark.
+
+SEED = 69
+
+def reference_max(g, depth, max_depth, alpha, beta):
+  if g.teams[1].active.hp == 0 or g.teams[0].active.hp == 0 or depth >= max_depth:
+    return game_state_eval(g, depth), None
+  value = -np.inf
+  for i in range(DEFAULT_N_ACTIONS):
+    next_value, _ = reference_min(g, i, depth + 1, max_depth, alpha, beta)
+    if next_value > value:
+      value, move = next_value, i
+      alpha = max(value, alpha)
+    if value >= beta:
+      return value, move
+  return value, move
+
+def reference_min(g, action, depth, max_depth, alpha, beta):
+  # le risposte dell'avversario vengono applicate in sequenza sulla stessa copia
+  state = deepcopy(g)
+  value = np.inf
+  for i in range(DEFAULT_N_ACTIONS):
+    next_state, _, _, _, _ = state.step([action, i])
+    next_value, _ = reference_max(next_state[0], depth + 1, max_depth, alpha, beta)
+    if next_value < value:
+      value, move = next_value, i
+      beta = min(value, beta)
+    if value <= alpha:
+      return value, move
+  return value, move
+
+def reference_action(g, max_depth):
+  # stessa stima delle mosse nascoste della policy (stesso seed), sulla copia
+  belief = OpponentBelief()
+  belief.observe(g)
+  root = deepcopy(g)
+  belief.fill(root.teams[1].active, random.Random(SEED))
+  return reference_max(root, 0, max_depth, -np.inf, np.inf)[1]
+
+@pytest.fixture(scope='module')
+def positions():
+  return build_corpus(0, 3)
+
+@pytest.mark.parametrize('max_depth', [2, 4])
+def test_fixed_depth_matches_reference(positions, max_depth):
+  expected = []
+  actions = []
+  for i, position in enumerate(positions):
+    random.seed(i)
+    expected.append(reference_action(deepcopy(position), max_depth))
+    # una policy nuova per posizione, come la reference che non ha memoria tra le chiamate
+    policy = AlphaBetaPolicy(max_depth, seed=SEED, tt_size=0, move_ordering=False, eval_debug=True)
+    random.seed(i)
+    actions.append(policy.get_action(deepcopy(position)))
+  assert actions == expected
+
+def test_batch_eval_matches_scalar(positions):
+  # la valutazione in blocco non deve cambiare né le azioni né gli step fatti
+  for batch_eval in (False, True):
+    actions = []
+    steps = 0
+    for i, position in enumerate(positions):
+      policy = AlphaBetaPolicy(4, seed=SEED, batch_eval=batch_eval)
+      random.seed(i)
+      actions.append(policy.get_action(deepcopy(position)))
+      steps += policy.search_stats()['steps']
+    if batch_eval:
+      assert (actions, steps) == expected
+    expected = (actions, steps)
+
+@pytest.mark.parametrize('max_depth', [3, 5])
+def test_iterative_deepening_reaches_odd_max_depth(positions, max_depth):
+  # con un budget ampio l'ultima iterazione arriva a max_depth anche se è dispari
+  policy = AlphaBetaPolicy(max_depth, seed=SEED, time_budget=60.)
+  random.seed(0)
+  policy.get_action(deepcopy(positions[0]))
+  assert policy.completed_depth == max_depth
@@ -0,0 +1,32 @@
+from copy import deepcopy
+
+import numpy as np
+
+from bots.BatchRollout import RolloutBatch
+from bots.MCTSPolicy import batch_rewards, reward
+from bots.SearchState import team_pkms
+
+from PolicyBenchmark import build_corpus
+
+def batch_state(g, batch: RolloutBatch, b: int):
+  # riscrive hp e ordine della battaglia b del batch su una copia di g
+  state = deepcopy(g)
+  for s, team in enumerate(state.teams):
+    pkms = team_pkms(team)
+    for p, pkm in enumerate(pkms):
+      pkm.hp = batch.hp[b, s, p]
+    order = batch.order[b, s]
+    team.active = pkms[order[0]]
+    team.party[:] = [pkms[p] for p in order[1:]]
+  return state
+
+def test_batch_rewards_match_reward():
+  # le foglie dei rollout vettoriali hanno lo stesso valore di reward() sugli stati finali
+  rng = np.random.default_rng(0)
+  for g in build_corpus(0, 3):
+    batch = RolloutBatch.repeat(g, 8)
+    assert np.allclose(batch_rewards(g, batch), reward(g))
+    batch.run(3, rng)
+    values = batch_rewards(g, batch)
+    for b in range(batch.n):
+      assert np.isclose(values[b], reward(batch_state(g, batch, b)))
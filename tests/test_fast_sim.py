@@ -0,0 +1,24 @@
+from copy import deepcopy
+
+from bots.FastSim import pack_moves, sim_view
+from bots.MCTSPolicy import MCTSPolicy
+from bots.SearchState import SearchState
+
+from PolicyBenchmark import build_corpus
+
+def test_sim_moves_follow_switches_in_the_tree():
+  position = build_corpus(0, 1)[0]
+  policy = MCTSPolicy(n_iterations=10, fast_sim=True)
+  policy.get_action(deepcopy(position))
+  state = policy._search.root
+  search = policy._search
+  root_moves = pack_moves(state)
+  # un cambio nell'albero: l'attivo diventa il primo del party
+  search.push(state)
+  next_state = search.step(state, [4, 0])
+  # le mosse impacchettate alla radice non valgono più per il nuovo ordine
+  assert pack_moves(next_state) != root_moves
+  sim = policy._sim_state(next_state)
+  assert sim.moves == pack_moves(next_state)
+  search.pop()
+  assert policy._sim_state(state).moves == pack_moves(state)
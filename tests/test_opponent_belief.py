@@ -0,0 +1,60 @@
+from copy import deepcopy
+
+import random
+
+from bots.OpponentBelief import OpponentBelief, roster_index
+
+from PolicyBenchmark import build_corpus
+
+def hide_moves(pkm) -> None:
+  for move in pkm.moves:
+    move.name = None
+
+def test_revealed_moves_follow_pkm_with_same_type_and_hp():
+  g = deepcopy(build_corpus(0, 1)[0])
+  team = g.teams[1]
+  # due pokemon avversari con lo stesso tipo e gli stessi hp massimi, distinti solo dagli hp
+  twin = team.party[0]
+  twin.type, twin.max_hp, twin.hp = team.active.type, team.active.max_hp, team.active.max_hp / 2
+  team.active.hp = team.active.max_hp
+  hide_moves(twin)
+  hide_moves(team.party[1])
+  revealed = deepcopy(team.active.moves[0])
+  for move in team.active.moves[1:]:
+    move.name = None
+  belief = OpponentBelief()
+  belief.observe(g)
+  # l'avversario cambia: nella vista successiva l'attivo è il gemello, senza mosse rivelate
+  g = deepcopy(g)
+  team = g.teams[1]
+  team.active, team.party[0] = team.party[0], team.active
+  hide_moves(team.party[0])
+  belief.observe(g)
+  assert belief.known_moves(team.active, 0) == []
+  assert [move.name for move in belief.known_moves(team.party[0], 1)] == [revealed.name]
+
+def test_candidates_only_narrow():
+  g = deepcopy(build_corpus(0, 1)[0])
+  pkm = g.teams[1].active
+  moves = [deepcopy(move) for move in pkm.moves]
+  hide_moves(pkm)
+  belief = OpponentBelief()
+  belief.observe(g)
+  index = roster_index()
+  support = None
+  # le mosse vengono rivelate una alla volta: il supporto della stima non si allarga mai
+  for move_i, move in enumerate(moves):
+    weights = belief.pkm_belief(pkm, 0).weights([], len(moves) - move_i, True)
+    current = {index.moves[i].name for i, w in enumerate(weights) if w > 0.}
+    assert support is None or current <= support
+    assert not current & {move.name for move in moves[:move_i]}
+    support = current
+    view = deepcopy(g)
+    view.teams[1].active.moves[move_i] = move
+    belief.observe(view)
+  # una stima non ripete le mosse rivelate
+  state = deepcopy(g)
+  state.teams[1].active.moves[0] = moves[0]
+  belief.fill(state.teams[1].active, random.Random(0))
+  names = [move.name for move in state.teams[1].active.moves]
+  assert sorted(names) == sorted(move.name for move in moves)
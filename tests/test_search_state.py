@@ -0,0 +1,38 @@
+from copy import deepcopy
+
+from bots.SearchState import SearchState, snapshot, team_pkms
+
+from PolicyBenchmark import build_corpus
+
+def state_values(g) -> list:
+  return snapshot(g, [team_pkms(team) for team in g.teams])[1:]
+
+def test_pop_restores_the_pushed_state():
+  position = build_corpus(0, 1)[1]
+  search = SearchState(position)
+  # uno stato diverso dalla radice, come quello restituito da uno step che non lavora in place
+  g = deepcopy(search.root)
+  root_before = state_values(search.root)
+  before = state_values(g)
+  search.push(g)
+  search.step(g, [0, 0])
+  for team in g.teams:
+    team.active.hp = 0.
+    team.stage[0] += 1
+    team.active, team.party[0] = team.party[0], team.active
+  search.pop()
+  assert state_values(g) == before
+  assert state_values(search.root) == root_before
+
+def test_push_pop_on_the_root():
+  position = build_corpus(0, 1)[1]
+  search = SearchState(position)
+  before = state_values(search.root)
+  search.push(search.root)
+  next_state = search.step(search.root, [0, 0])
+  search.push(next_state)
+  search.step(next_state, [1, 1])
+  search.pop()
+  search.pop()
+  assert state_values(search.root) == before
+  assert search.depth() == 0
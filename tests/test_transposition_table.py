@@ -0,0 +1,39 @@
+import random
+
+from bots.SearchState import SearchState
+from bots.TranspositionTable import ZobristHasher, state_features, step_actives, changed_parts, update_features
+
+from PolicyBenchmark import build_corpus
+
+def test_incremental_key_matches_full_hash():
+  # catene di step casuali (mosse e cambi): feature e chiave aggiornate sulle sole parti
+  # cambiate devono coincidere con quelle ricalcolate da zero
+  hasher = ZobristHasher(0)
+  rng = random.Random(0)
+  for position in build_corpus(0, 3):
+    search = SearchState(position)
+    state = search.root
+    features = state_features(state)
+    key = hasher.hash(features)
+    for _ in range(8):
+      actives = step_actives(state)
+      state = search.step(state, [rng.randrange(6), rng.randrange(6)])
+      parts = changed_parts(state, actives)
+      next_features = update_features(features, state, parts)
+      key = hasher.update(key, features, next_features, parts)
+      features = next_features
+      assert features == state_features(state)
+      assert key == hasher.hash(features)
+      if state.teams[0].active.hp == 0 or state.teams[1].active.hp == 0:
+        break
+
+def test_party_pp_and_exact_hp_are_features():
+  g = build_corpus(0, 1)[0]
+  search = SearchState(g)
+  state = search.root
+  features = state_features(state)
+  state.teams[0].party[0].moves[0].pp -= 1
+  assert state_features(state) != features
+  state.teams[0].party[0].moves[0].pp += 1
+  state.teams[0].active.hp -= 0.25
+  assert state_features(state) != features